@@ -1,24 +1,22 @@
 import streamlit as st
 import pandas as pd
 import os
+import sys
 import random
 from datetime import datetime
 
+# --- SHARED ENGINE (the rules + storage live one folder up, same as the Burn Book app) ---
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bank_engine as engine
+from storage import get_store
+
 # --- SETUP: FILE HANDLING ---
-CLIENT_FILE = "ledger.csv"
-PERSONAL_FILE = "my_budget.csv"
 QUOTES_FILE = "quotes.csv"  # <--- Make sure your file is named this!
+STORE = get_store()  # ledger.csv / my_budget.csv in this folder (old 7-column ledgers get upgraded once, on open)
 
 # --- DATA LOADING FUNCTIONS ---
-def load_client_data():
-    if not os.path.exists(CLIENT_FILE):
-        return pd.DataFrame(columns=["Date", "Client", "Type", "Amount", "Note", "Savings_Balance", "Niece_Earnings"])
-    return pd.read_csv(CLIENT_FILE)
-
 def load_personal_data():
-    if not os.path.exists(PERSONAL_FILE):
-        return pd.DataFrame(columns=["Date", "Category", "Item", "Amount", "Sass_Level"])
-    return pd.read_csv(PERSONAL_FILE)
+    return STORE.load("budget")
 
 def get_daily_quote():
     # 1. Check if file exists
@@ -41,29 +39,12 @@ def get_daily_quote():
     except Exception as e:
         return f"Secure the bag. (Error reading quotes: {e})"
 
-# --- SAVE FUNCTIONS ---
-def save_client_transaction(client_name, type, amount, note, savings_change, earnings_change):
-    df = load_client_data()
-    client_data = df[df["Client"] == client_name]
-    current_savings = client_data.iloc[-1]["Savings_Balance"] if not client_data.empty else 0.0
-    new_savings = current_savings + savings_change
-    
-    new_entry = pd.DataFrame([{
-        "Date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "Client": client_name, "Type": type, "Amount": amount, "Note": note,
-        "Savings_Balance": new_savings, "Niece_Earnings": earnings_change 
-    }])
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(CLIENT_FILE, index=False)
+# --- SAVE FUNCTIONS (rules in bank_engine.py) ---
+def save_posting(posting):
+    engine.post(STORE, posting)
 
 def save_personal_transaction(category, item, amount, sass):
-    df = load_personal_data()
-    new_entry = pd.DataFrame([{
-        "Date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "Category": category, "Item": item, "Amount": amount, "Sass_Level": sass
-    }])
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(PERSONAL_FILE, index=False)
+    engine.record_budget(STORE, category, item, amount, sass)
 
 # --- THE SASS ENGINE ---
 def get_sass(mood):
@@ -108,9 +89,7 @@ if mode == "💼 The Firm (Clients)":
     st.title("💼 The Firm: Client Management")
     st.caption("Manage other people's money. Collect your fees.")
     
-    df = load_client_data()
-    
-    existing_clients = df["Client"].unique().tolist() if not df.empty else []
+    existing_clients = STORE.client_names()
     client_menu = ["➕ Add New Client"] + existing_clients
     selected_client = st.sidebar.selectbox("Select Client", client_menu)
 
@@ -118,16 +97,16 @@ if mode == "💼 The Firm (Clients)":
         new_name = st.sidebar.text_input("Client Name")
         if st.sidebar.button("Add Client"):
             if new_name and new_name not in existing_clients:
-                save_client_transaction(new_name, "Open", 0, "Welcome", 0, 0)
+                save_posting(engine.open_account(new_name, note="Welcome"))
                 st.rerun()
         st.info("👈 Add a client to start.")
         st.stop()
     
     current_client = selected_client
     
-    client_df = df[df["Client"] == current_client]
-    client_balance = client_df.iloc[-1]["Savings_Balance"] if not client_df.empty else 0.0
-    total_revenue = df["Niece_Earnings"].sum()
+    client_df = STORE.client_history(current_client)
+    client_balance = engine.balance(STORE, current_client)
+    total_revenue = STORE.revenue()
 
     st.sidebar.markdown("---")
     st.sidebar.metric("Your Total Earnings", f"${total_revenue:,.2f}")
@@ -141,38 +120,38 @@ if mode == "💼 The Firm (Clients)":
         
         if action == "Incoming Deposit":
             amount = st.number_input("Deposit Amount", value=10.00)
-            st.write(f"**Quiz:** What is 15% of ${amount}?")
+            st.write(f"**Quiz:** What is {engine.HOUSE_CUT:.0%} of ${amount}?")
             guess = st.number_input("Your Math:", value=0.00)
             
             if st.button("Secure the Bag 💰"):
-                real_earn = round(amount * 0.15, 2)
-                client_save = amount - real_earn
-                if abs(guess - real_earn) < 0.01:
+                real_earn = engine.house_cut(amount)
+                if engine.math_checks_out(guess, real_earn):
                     st.success(f"Correct! {get_sass('good_math')}")
                     st.balloons()
                     note = "Deposit (Math Correct)"
                 else:
                     st.error(f"Wrong. Answer is ${real_earn}. {get_sass('bad_math')}")
                     note = "Deposit (Math Auto-Fixed)"
-                save_client_transaction(current_client, "Deposit", amount, note, client_save, real_earn)
+                save_posting(engine.deposit(current_client, amount, note))
                 st.rerun()
 
         elif action == "Client Withdrawal":
             amount = st.number_input("Withdraw Amount", min_value=0.0)
             if st.button("Process Withdrawal"):
-                if amount <= client_balance:
-                    save_client_transaction(current_client, "Withdrawal", amount, "Client access", -amount, 0)
+                try:
+                    save_posting(engine.loan(current_client, amount, "Client access", balance=client_balance))
+                except engine.InsufficientFunds as e:
+                    st.error(str(e))
+                else:
                     st.success("Withdrawal processed.")
                     st.rerun()
-                else:
-                    st.error("Insufficient funds!")
 
         elif action == "Charge Penalty":
             days = st.number_input("Days Late", min_value=1)
-            penalty = days * 5.00
+            penalty = engine.late_fee(days)
             st.write(f"Penalty: ${penalty:.2f}")
             if st.button("Charge Penalty 💀"):
-                save_client_transaction(current_client, "Penalty", penalty, "Late Fee", 0, penalty)
+                save_posting(engine.penalty(current_client, days))
                 st.success(f"Charged ${penalty} penalty.")
                 st.rerun()
     with tab2:
@@ -193,12 +172,10 @@ elif mode == "👛 My Empire (Budget)":
     st.markdown(f'<div class="quote-box">📅 <strong>Daily Wisdom:</strong> "{quote}"</div>', unsafe_allow_html=True)
 
     # --- CALCULATE MONEY ---
-    client_df = load_client_data()
     personal_df = load_personal_data()
-    total_income = client_df["Niece_Earnings"].sum() if not client_df.empty else 0.0
-    total_spent = personal_df[personal_df["Category"] == "Spending"]["Amount"].sum()
-    total_saved = personal_df[personal_df["Category"] == "Savings Goal"]["Amount"].sum()
-    available_cash = total_income - (total_spent + total_saved)
+    total_income = STORE.revenue()
+    total_saved = engine.category_total(personal_df, "Savings Goal")
+    available_cash = engine.available_cash(total_income, personal_df)
 
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Income (The Firm)", f"${total_income:,.2f}")
@@ -0,0 +1,317 @@
+import bisect
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from ledger_index import file_signature
+
+# --- STATIC CONTENT (gossip, quotes, pigs) ---
+# Like the ledger index, this lives outside bank_app.py so it stays warm across Streamlit reruns.
+CONTENT_CACHE_DIR = ".content_cache"
+CONTENT_PACKS = [("facts.csv", "Fun Fact"), ("quotes.csv", "DailyMotoQuote")]
+PIG_FILE = "pig_map.csv"
+GIF_DIR = "gifs"
+GIF_WIDTH = 400
+GIF_EXTENSIONS = ('.gif', '.png', '.jpg', '.jpeg', '.webp')
+BANNER_WIDTH = 1200
+
+
+# --- CONTENT PACK COMPILER ---
+# Turns a CSV into a small JSON array holding just the one column we show. quotes.csv has a ragged
+# header with a pile of empty extra columns, so it's read with the csv module instead of pandas.
+def _pack_path(file_path, column_name):
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    column = "".join(c if c.isalnum() else "_" for c in column_name)
+    return os.path.join(CONTENT_CACHE_DIR, f"{base}.{column}.json")
+
+def compile_content_pack(file_path, column_name):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        col = header.index(column_name)  # ValueError if the column isn't there
+        items = [row[col] if col < len(row) else "" for row in reader if any(cell.strip() for cell in row)]
+    pack = {"source": file_path, "column": column_name, "signature": list(file_signature(file_path)), "items": items}
+    os.makedirs(CONTENT_CACHE_DIR, exist_ok=True)
+    tmp_path = _pack_path(file_path, column_name) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pack, f, ensure_ascii=False)
+    os.replace(tmp_path, _pack_path(file_path, column_name))
+    return items
+
+def load_content_pack(file_path, column_name):
+    # Use the compiled pack if it was built from this exact version of the CSV, otherwise rebuild it
+    try:
+        with open(_pack_path(file_path, column_name), encoding="utf-8") as f:
+            pack = json.load(f)
+        if tuple(pack["signature"]) == file_signature(file_path):
+            return pack["items"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return compile_content_pack(file_path, column_name)
+
+
+# --- DAILY PICK (memoized per file version and day) ---
+_DAILY_MEMO = {}
+_DAILY_LOCK = threading.Lock()
+
+def daily_content(file_path, column_name, fallback, day_of_year=None):
+    signature = file_signature(file_path)
+    if signature is None:
+        return fallback
+    if day_of_year is None:
+        day_of_year = datetime.now().timetuple().tm_yday
+    key = (file_path, column_name, signature, day_of_year)
+    with _DAILY_LOCK:
+        if key in _DAILY_MEMO:
+            return _DAILY_MEMO[key]
+    try:
+        items = load_content_pack(file_path, column_name)
+        value = items[(day_of_year - 1) % len(items)] if items else ""
+    except (OSError, ValueError):
+        value = ""
+    value = value.strip() or fallback
+    with _DAILY_LOCK:
+        if len(_DAILY_MEMO) > 64:
+            _DAILY_MEMO.clear()
+        _DAILY_MEMO[key] = value
+    return value
+
+
+# --- PIGGY BANK SPRITES ---
+# pig_map.csv compiles to two parallel sorted lists (thresholds, image files) so picking a pig
+# is a bisect. The sprites themselves are read once and served as bytes from memory.
+_PIG_TABLE = {"signature": None, "thresholds": [], "images": []}
+_SPRITES = {}
+_PIG_LOCK = threading.Lock()
+
+def _pig_table(pig_file):
+    signature = file_signature(pig_file)
+    with _PIG_LOCK:
+        if _PIG_TABLE["signature"] != (pig_file, signature):
+            rows = []
+            if signature is not None:
+                with open(pig_file, newline="", encoding="utf-8-sig") as f:
+                    rows = sorted((float(r["Threshold"]), r["Image_File"]) for r in csv.DictReader(f))
+            _PIG_TABLE["signature"] = (pig_file, signature)
+            _PIG_TABLE["thresholds"] = [t for t, _ in rows]
+            _PIG_TABLE["images"] = [img for _, img in rows]
+        return _PIG_TABLE["thresholds"], _PIG_TABLE["images"]
+
+def pig_sprite(image_file):
+    signature = file_signature(image_file)
+    if signature is None:
+        return None
+    with _PIG_LOCK:
+        cached = _SPRITES.get(image_file)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    with open(image_file, "rb") as f:
+        data = f.read()
+    with _PIG_LOCK:
+        _SPRITES[image_file] = (signature, data)
+    return data
+
+def pig_image_file(current_percent, pig_file=PIG_FILE):
+    thresholds, images = _pig_table(pig_file)
+    if not images:
+        return None
+    if current_percent is None or math.isnan(current_percent):
+        return images[0]
+    # Highest threshold we've reached; below the lowest one we still show the first pig
+    return images[max(bisect.bisect_right(thresholds, current_percent) - 1, 0)]
+
+def pig_images(percents, pig_file=PIG_FILE):
+    # Batch version for the goal cards: one table lookup, one searchsorted, sprites from memory
+    thresholds, images = _pig_table(pig_file)
+    if not images:
+        return [None] * len(percents)
+    percents = np.asarray(percents, dtype=float)
+    positions = np.maximum(np.searchsorted(thresholds, percents, side="right") - 1, 0)
+    positions[np.isnan(percents)] = 0
+    return [pig_sprite(images[p]) for p in positions]
+
+
+# --- SASS GIF MANIFEST ---
+# mood -> list of assets (path, bytes, dimensions, content hash). Built once, and a mood folder is
+# only rescanned when its mtime changes, so dropping a new GIF in shows up without a restart.
+_GIF_MANIFEST = {}
+_GIF_LOCK = threading.Lock()
+_VARIANTS_IN_PROGRESS = set()
+VARIANT_ERRORS = {}  # hash -> why its variant couldn't be rendered (this process only)
+
+def _scan_mood(folder):
+    assets = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(GIF_EXTENSIONS):
+            continue
+        path = os.path.join(folder, name)
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        width = height = None
+        try:
+            from PIL import Image
+            with Image.open(path) as im:
+                width, height = im.size
+        except Exception:
+            pass
+        assets.append({"path": path, "size": os.path.getsize(path), "width": width, "height": height, "hash": digest})
+    return assets
+
+def gif_manifest(mood, gif_dir=GIF_DIR):
+    folder = os.path.join(gif_dir, mood)
+    signature = file_signature(folder)
+    if signature is None:
+        return []
+    with _GIF_LOCK:
+        cached = _GIF_MANIFEST.get(folder)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    assets = _scan_mood(folder)
+    with _GIF_LOCK:
+        _GIF_MANIFEST[folder] = (signature, assets)
+    return assets
+
+def build_gif_manifest(gif_dir=GIF_DIR):
+    if not os.path.isdir(gif_dir):
+        return {}
+    return {mood: gif_manifest(mood, gif_dir) for mood in sorted(os.listdir(gif_dir))
+            if os.path.isdir(os.path.join(gif_dir, mood))}
+
+
+# --- GIF VARIANTS ---
+# A re-encoded copy at most GIF_WIDTH wide, cached under .content_cache/gifs by content hash
+# (so duplicates across mood folders share one file). Only kept if it beats the original; if it
+# doesn't, an empty <hash>_<width>.original marker says "serve the original" instead.
+def _variant_path(asset, width=GIF_WIDTH):
+    return os.path.join(CONTENT_CACHE_DIR, "gifs", f"{asset['hash']}_{width}.webp")
+
+def _original_marker(asset, width=GIF_WIDTH):
+    return os.path.join(CONTENT_CACHE_DIR, "gifs", f"{asset['hash']}_{width}.original")
+
+def render_gif_variant(asset, width=GIF_WIDTH):
+    from PIL import Image
+
+    target = _variant_path(asset, width)
+    with Image.open(asset["path"]) as im:
+        scale = min(1.0, width / im.width)
+        size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+        frames, durations = [], []
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            im.load()
+            durations.append(im.info.get("duration", 100))
+            frame = im.convert("RGBA")
+            frames.append(frame.resize(size, Image.LANCZOS) if frame.size != size else frame)
+        loop = im.info.get("loop", 0)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".tmp"
+    frames[0].save(tmp_path, format="WEBP", save_all=True, append_images=frames[1:],
+                   duration=durations, loop=loop, quality=70, method=4)
+    if os.path.getsize(tmp_path) >= asset["size"]:
+        # Re-encoding didn't help: drop it and leave the marker, so the original path gets served
+        os.remove(tmp_path)
+        open(_original_marker(asset, width), "w").close()
+        return asset["path"]
+    os.replace(tmp_path, target)
+    return target
+
+def _render_in_background(asset, width):
+    def work():
+        try:
+            render_gif_variant(asset, width)
+        except Exception as e:
+            # Not worth breaking the page over, but say so once, and don't retry it every rerun
+            VARIANT_ERRORS[asset["hash"]] = repr(e)
+            print(f"GIF variant for {asset['path']} failed: {e!r}", file=sys.stderr)
+        finally:
+            with _GIF_LOCK:
+                _VARIANTS_IN_PROGRESS.discard(asset["hash"])
+
+    with _GIF_LOCK:
+        if asset["hash"] in _VARIANTS_IN_PROGRESS or asset["hash"] in VARIANT_ERRORS:
+            return
+        _VARIANTS_IN_PROGRESS.add(asset["hash"])
+    threading.Thread(target=work, daemon=True).start()
+
+def gif_variant(asset, width=GIF_WIDTH):
+    # Never make the page wait on an encode: serve the original until the variant exists (and for
+    # good once the marker says the variant can't beat it)
+    target = _variant_path(asset, width)
+    if os.path.exists(target):
+        return target
+    if not os.path.exists(_original_marker(asset, width)):
+        _render_in_background(asset, width)
+    return asset["path"]
+
+def pick_sass_gif(mood, gif_dir=GIF_DIR):
+    assets = gif_manifest(mood, gif_dir)
+    return gif_variant(random.choice(assets)) if assets else None
+
+
+# --- BANNERS ---
+# Each base name is probed once per process; after that the banner is served from pre-encoded
+# bytes in memory (whichever of WebP/PNG is smaller, never wider than BANNER_WIDTH).
+_BANNERS = {}
+_BANNER_LOCK = threading.Lock()
+
+def resolve_banner(base_name):
+    for ext in (".png", ".PNG", ".jpg", ".JPG"):
+        if os.path.exists(base_name + ext):
+            return base_name + ext
+    return None
+
+def encode_banner(path, width=BANNER_WIDTH):
+    with open(path, "rb") as f:
+        original = f.read()
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(original)) as im:
+            im = im.convert("RGBA")
+            if im.width > width:
+                im = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+            candidates = [original]
+            for fmt, options in (("WEBP", {"quality": 80}), ("PNG", {"optimize": True})):
+                buf = io.BytesIO()
+                im.save(buf, format=fmt, **options)
+                candidates.append(buf.getvalue())
+        return min(candidates, key=len)
+    except Exception:
+        return original
+
+def banner_image(base_name, width=BANNER_WIDTH):
+    key = (base_name, width)
+    with _BANNER_LOCK:
+        if key in _BANNERS:
+            return _BANNERS[key]
+    path = resolve_banner(base_name)
+    data = encode_banner(path, width) if path else None
+    with _BANNER_LOCK:
+        _BANNERS[key] = data
+    return data
+
+
+if __name__ == "__main__":
+    # python assets.py compile  -> prebuild the content packs (the app also builds them lazily)
+    # python assets.py gifs     -> prebuild every GIF variant
+    command = sys.argv[1] if len(sys.argv) > 1 else "compile"
+    if command == "compile":
+        for file_path, column_name in CONTENT_PACKS:
+            if os.path.exists(file_path):
+                items = compile_content_pack(file_path, column_name)
+                print(f"{file_path}: {len(items)} entries -> {_pack_path(file_path, column_name)}")
+    elif command == "gifs":
+        for mood, assets in build_gif_manifest().items():
+            for asset in assets:
+                target = render_gif_variant(asset)
+                print(f"{asset['path']}: {asset['size']:,} -> {os.path.getsize(target):,} bytes")
+    else:
+        sys.exit(f"Unknown command: {command}")
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import socket
+from datetime import date
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import bank_engine as engine
+import exporter
+from storage import get_store
+
+# --- LOCAL POSTING API ---
+# A small asyncio HTTP/JSON server on top of bank_engine.py, for integrations that want to post
+# transactions or read balances without a browser session. Requests that arrive together are
+# coalesced: each one is validated on its own (into engine Postings), then the lot goes to the store
+# as ONE commit, so a burst of hundreds of postings costs a handful of fsyncs. Postings are applied
+# in the order they arrive. Binds to 127.0.0.1 only.
+#   python bank_api.py --port 8765
+#
+#   POST /postings  {"postings": [{"client": "Regina", "type": "Deposit", "amount": 20}, ...]}
+#                   -> {"posted": 1, "balances": {"Regina": 17.0}, "earnings": 3.0}
+#                   (fields: client, type, amount, and optionally note, date, days_late, target, frequency)
+#   GET  /balance?client=Regina  -> {"client": "Regina", "balance": ..., "target": ..., "frequency": ..., "earnings": ...}
+#   GET  /balances               -> {"clients": {"Regina": ...}, "revenue": ...}
+#   GET  /health                 -> {"ok": true, "batches": ..., "postings": ...}
+#   GET  /export?client=Regina&statement=1&start=2025-01-01&end=2025-06-30&format=jsonl
+#                   -> streamed (chunked) CSV / JSON Lines download, see exporter.py. table=budget
+#                   for the Burn Book; every filter is optional. The Table links here when it's up.
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_BATCH_ROWS = 50_000
+FIELD_NAMES = {
+    "client": "Client", "type": "Type", "amount": "Amount", "note": "Note", "date": "Date",
+    "days_late": "Days_Late", "target": "Target", "frequency": "Frequency",
+}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Download:
+    # A route result that goes out as a chunked stream instead of one JSON body
+    def __init__(self, chunks, mime, file_name):
+        self.chunks, self.mime, self.file_name = chunks, mime, file_name
+
+
+# --- GROUP COMMIT ---
+class PostingBatcher:
+    def __init__(self, store):
+        self.store = store
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.postings = 0
+
+    async def submit(self, postings):
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((postings, done))
+        return await done
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            rows = len(items[0][0])
+            while not self.queue.empty() and rows < MAX_BATCH_ROWS:
+                items.append(self.queue.get_nowait())
+                rows += len(items[-1][0])
+            postings = [p for part, _ in items for p in part]
+            try:
+                committed = await loop.run_in_executor(None, engine.post, self.store, postings)
+            except Exception as e:
+                for _, done in items:
+                    if not done.cancelled():
+                        done.set_exception(e)
+                continue
+            self.batches += 1
+            self.postings += len(committed)
+            start = 0
+            for part, done in items:
+                if not done.cancelled():
+                    done.set_result(committed.iloc[start:start + len(part)])
+                start += len(part)
+
+
+# --- ROUTES ---
+class BankApi:
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self.batcher = PostingBatcher(self.store)
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/postings":
+            if method != "POST":
+                raise ApiError(405, "POST only")
+            return await self.post_postings(body)
+        if method != "GET":
+            raise ApiError(405, "GET only")
+        if url.path == "/balance":
+            if "client" not in query:
+                raise ApiError(400, "client is required")
+            return await self.balance(query["client"])
+        if url.path == "/balances":
+            return await self._in_thread(self._balances)
+        if url.path == "/health":
+            return {"ok": True, "batches": self.batcher.batches, "postings": self.batcher.postings}
+        if url.path == "/export":
+            return self.export(query)
+        raise ApiError(404, f"No such endpoint: {url.path}")
+
+    async def post_postings(self, body):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise ApiError(400, "Body must be JSON")
+        records = payload.get("postings") if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+            raise ApiError(400, 'Expected {"postings": [{...}, ...]}')
+        try:
+            postings = [engine.posting_from_record({FIELD_NAMES.get(str(k).lower(), k): v for k, v in r.items()})
+                        for r in records]
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        committed = await self.batcher.submit(postings)
+        return {
+            "posted": len(committed),
+            "balances": committed.groupby("Client", sort=False)["Savings_Balance"].last().astype(float).to_dict(),
+            "earnings": float(committed["Niece_Earnings"].sum()),
+        }
+
+    async def balance(self, client):
+        if client not in await self._in_thread(self.store.client_names):
+            raise ApiError(404, f"No client named {client!r}")
+        stats = await self._in_thread(self.store.client_summary, client)
+        return {"client": client, "balance": float(stats["balance"]), "target": float(stats["target"]),
+                "frequency": stats.get("frequency", ""), "earnings": float(stats.get("earnings", 0.0))}
+
+    def export(self, query):
+        try:
+            table = query.get("table", "ledger")
+            if table == "goals":
+                raise ValueError("goals isn't exportable, it's three rows")
+            fmt = query.get("format", "csv")
+            start, end = (date.fromisoformat(query[k]) if query.get(k) else None for k in ("start", "end"))
+            client, statement = query.get("client") or None, query.get("statement", "") in ("1", "true", "yes")
+            chunks = exporter.stream_export(self.store, table, client, start, end, fmt, statement)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        return Download(chunks, exporter.FORMATS[fmt], exporter.export_name(table, client, start, end, fmt, statement))
+
+    def _balances(self):
+        clients = {name: float(self.store.client_summary(name)["balance"]) for name in self.store.client_names()}
+        return {"clients": clients, "revenue": float(self.store.revenue())}
+
+    async def _in_thread(self, fn, *args):
+        # Store calls touch files / sqlite; keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    # --- HTTP/1.1 (just enough of it) ---
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise ApiError(413, f"Body over {MAX_BODY_BYTES} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = 200, await self.route(method, target, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": repr(e)}
+                if isinstance(payload, Download):
+                    if not await self._send_download(writer, payload, version == "HTTP/1.1"):
+                        break
+                    if not keep_alive:
+                        break
+                    continue
+                data = json.dumps(payload).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent garbage
+        finally:
+            writer.close()
+
+    async def _send_download(self, writer, download, chunked):
+        # Each chunk is read (off the event loop) only after the last one drained to the socket, so
+        # a slow browser holds one chunk, not the file. HTTP/1.0 gets the raw bytes and a close.
+        # Returns False when the connection has to close (1.0, or the export broke mid-stream).
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: {download.mime}; charset=utf-8\r\n"
+                      f"Content-Disposition: attachment; filename*=UTF-8''{quote(download.file_name)}\r\n"
+                      + ("Transfer-Encoding: chunked\r\n\r\n" if chunked else "Connection: close\r\n\r\n")).encode("latin-1"))
+        await writer.drain()
+        while True:
+            try:
+                chunk = await self._in_thread(next, download.chunks, None)
+            except Exception:
+                return False  # no terminating chunk: the client sees a broken download, not a short one
+            if chunk is None:
+                break
+            writer.write(b"%X\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+            await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return chunked
+
+    async def serve(self, host=API_HOST, port=API_PORT, ready=None):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+# --- LINKS FROM THE APP ---
+def api_up(host=API_HOST, port=API_PORT):
+    # A connect to localhost either works or is refused right away
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+def export_url(host=API_HOST, port=API_PORT, **params):
+    params = {k: v for k, v in params.items() if v not in (None, False, "")}
+    return f"http://{host}:{port}/export?" + urlencode({k: 1 if v is True else v for k, v in params.items()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JSON API for batch postings and balances")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    api = BankApi()
+    print(f"Bank API on http://{args.host}:{args.port} ({api.store.name} storage). Ctrl+C to stop.")
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
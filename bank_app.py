@@ -1,133 +1,218 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
+import html
+import functools
+import math
 import random
-from datetime import datetime
+from datetime import date, timedelta
+import bank_api
+import bank_engine as engine
+import exporter
+import perf
+import projection
+import scheduler
+from perf import span, timed
+from storage import DATE_FORMAT, LOADER_CACHE, get_store
+from assets import banner_image, build_gif_manifest, daily_content, pick_sass_gif, pig_image_file, pig_images, pig_sprite
 
 # --- FILE & FOLDER SETUP ---
-CLIENT_FILE = "ledger.csv"
-PERSONAL_FILE = "my_budget.csv"
 QUOTES_FILE = "quotes.csv"
-GOALS_FILE = "goals.csv"
 FACTS_FILE = "facts.csv"
 PIG_FILE = "pig_map.csv"
 GIF_DIR = "gifs"  # The main folder
 
+# --- BURN BOOK FEED ---
+BURN_BOOK_PAGE_SIZES = [10, 25, 50, 100]
+EDITOR_PAGE_SIZE = 50  # rows the Burn Book editor sends to the browser at a time
+HISTORY_LAST_N = 25    # client history: newest rows shown by default
+EXPORT_FORMATS = {"CSV": "csv", "JSON Lines": "jsonl"}
+
 # --- BANNER FILES ---
 EMPIRE_BANNER = "banner.png"
 FIRM_BANNER = "firm_banner.png"
 
+# --- STORAGE (csv by default, BANK_STORAGE=sqlite for bank.db, BANK_STORAGE=parquet for ledger_parquet/) ---
+STORE = get_store()
+
+# --- PERF (BANK_PERF=0 to switch off, see perf.py) ---
+perf.start_run()
+
 # --- DATA LOADING ---
+@timed("load ledger")
 def load_client_data():
-    if not os.path.exists(CLIENT_FILE):
-        return pd.DataFrame(columns=["Date", "Client", "Type", "Amount", "Note", "Savings_Balance", "Niece_Earnings", "Target", "Frequency"])
-    df = pd.read_csv(CLIENT_FILE)
-    if "Target" not in df.columns: df["Target"] = 0.0
-    if "Frequency" not in df.columns: df["Frequency"] = ""
-    return df
+    return STORE.load("ledger")
 
+@timed("load budget")
 def load_personal_data():
-    if not os.path.exists(PERSONAL_FILE):
-        return pd.DataFrame(columns=["Date", "Category", "Item", "Amount", "Sass_Level"])
-    return pd.read_csv(PERSONAL_FILE)
+    return STORE.load("budget")
 
-def save_personal_data(df):
-    df.to_csv(PERSONAL_FILE, index=False)
+@timed("save budget edits")
+def save_budget_edits(window, changes):
+    # Just the inserted / edited / deleted rows, not the whole file
+    return engine.apply_edits(STORE, "budget", *engine.editor_changes(window, changes))
 
+@timed("load goals")
 def load_goals():
-    if not os.path.exists(GOALS_FILE):
-        data = {
-            "Goal_ID": ["Goal 1", "Goal 2", "Goal 3"],
-            "Name": ["Spring Fling Dress", "College", "Pink Jeep"],
-            "Target": [1000.0, 5000.0, 300.0],
-            "Balance": [0.0, 0.0, 0.0]
-        }
-        df = pd.DataFrame(data)
-        df.to_csv(GOALS_FILE, index=False)
-        return df
-    return pd.read_csv(GOALS_FILE)
+    return STORE.load("goals")
 
+@timed("daily content")
 def get_daily_content(file_path, column_name, fallback):
-    if not os.path.exists(file_path):
-        return fallback
-    try:
-        df = pd.read_csv(file_path)
-        day_of_year = datetime.now().timetuple().tm_yday
-        index = (day_of_year - 1) % len(df)
-        return df.iloc[index][column_name]
-    except:
-        return fallback
+    # Served from a precompiled content pack, memoized per file version and day (see assets.py)
+    return daily_content(file_path, column_name, fallback)
 
 # --- HELPER: SMART BANNER ---
+@timed("banner")
 def show_smart_banner(base_name, fallback_title):
-    possible_files = [f"{base_name}.png", f"{base_name}.PNG", f"{base_name}.jpg", f"{base_name}.JPG"]
-    found = False
-    for f in possible_files:
-        if os.path.exists(f):
-            st.image(f, use_column_width=True)
-            found = True
-            break
-    if not found:
+    # Probed once per process, then served as pre-encoded bytes (see assets.py)
+    banner = banner_image(base_name)
+    if banner:
+        st.image(banner, use_column_width=True)
+    else:
         st.markdown(f"<h1 style='color:#D81B60; font-family: Brush Script MT, cursive;'>{fallback_title}</h1>", unsafe_allow_html=True)
 
 # --- PIGGY BANK LOGIC ---
+@timed("pig image")
 def get_pig_image(current_percent):
-    if not os.path.exists(PIG_FILE):
-        return None
+    # Compiled threshold table + in-memory sprites (see assets.py)
     try:
-        df = pd.read_csv(PIG_FILE)
-        df = df.sort_values(by="Threshold")
-        selected_image = df.iloc[0]["Image_File"]
-        for index, row in df.iterrows():
-            if current_percent >= row["Threshold"]:
-                selected_image = row["Image_File"]
-        return selected_image
+        image_file = pig_image_file(current_percent, PIG_FILE)
+        return pig_sprite(image_file) if image_file else None
     except:
         return None
 
-# --- SAVE FUNCTIONS ---
+@timed("pig images")
+def get_pig_images(percents):
+    try:
+        return pig_images(percents, PIG_FILE)
+    except:
+        return [None] * len(percents)
+
+# --- SAVE FUNCTIONS (the rules live in bank_engine.py) ---
+@timed("save client transaction")
+def save_posting(posting):
+    # The store works out Savings_Balance at commit time so concurrent sessions can't clobber each other
+    return engine.post(STORE, posting)
+
 def save_client_transaction(client_name, type, amount, note, savings_change, earnings_change, target=0.0, freq=""):
-    df = load_client_data()
-    client_data = df[df["Client"] == client_name]
-    current_savings = client_data.iloc[-1]["Savings_Balance"] if not client_data.empty else 0.0
-    new_savings = current_savings + savings_change
-    
-    new_entry = pd.DataFrame([{
-        "Date": datetime.now().strftime("%Y-%m-%d %H:%M"), 
-        "Client": client_name, "Type": type, 
-        "Amount": amount, "Note": note, 
-        "Savings_Balance": new_savings, "Niece_Earnings": earnings_change,
-        "Target": target, "Frequency": freq
-    }])
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(CLIENT_FILE, index=False)
+    return save_posting(engine.Posting(client_name, type, amount, note, savings_change, earnings_change, target, freq))
 
+@timed("save personal transaction")
 def save_personal_transaction(category, item, amount, sass):
-    df = load_personal_data()
-    if category in ["Spending", "Withdraw from Savings", "Early Withdrawal"]:
-        amount = -amount
-    new_entry = pd.DataFrame([{
-        "Date": datetime.now().strftime("%Y-%m-%d %H:%M"), "Category": category, 
-        "Item": item, "Amount": amount, "Sass_Level": sass
-    }])
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(PERSONAL_FILE, index=False)
+    engine.record_budget(STORE, category, item, amount, sass)
 
+@timed("update goal")
 def update_goal(goal_name, amount_change):
-    df = load_goals()
-    idx = df.index[df['Name'] == goal_name].tolist()[0]
-    df.at[idx, 'Balance'] += amount_change
-    df.to_csv(GOALS_FILE, index=False)
+    engine.adjust_goal(STORE, goal_name, amount_change)
+
+@timed("goal transfer")
+def move_goal_money(transfer, sass):
+    engine.apply_goal_transfer(STORE, transfer, sass)
+
+# --- SAVINGS PROJECTIONS (see projection.py) ---
+PROJECTION_BUCKETS = {30: "Within a month", 90: "1-3 months", 180: "3-6 months", projection.HORIZON_DAYS: "6-12 months"}
+
+@timed("projection")
+def project_client(client_name):
+    # Her balance band plus her row of the time-to-goal table, from her whole history
+    book = projection.client_inputs(STORE.client_history(client_name))
+    return projection.balance_band(book), projection.project(book, projection.APP_PATHS).iloc[0]
+
+@timed("book projection")
+def project_book():
+    # Every client's median time to goal, bucketed; cached until the ledger changes
+    book = projection.book_projection(STORE)
+    projected = book[book["Status"] == "projected"]
+    bucket = pd.cut(projected["Days_P50"], [-1, *PROJECTION_BUCKETS], labels=list(PROJECTION_BUCKETS.values()))
+    counts = pd.concat([pd.Series({"Already there": (book["Status"] == "there").sum()}),
+                        bucket.value_counts(sort=False),
+                        pd.Series({"Not this year": projected["Days_P50"].isna().sum()})])
+    return counts.rename("Clients"), book
 
 # --- FOLDER-BASED GIF ENGINE ---
+with span("gif manifest"):
+    build_gif_manifest(GIF_DIR)  # cheap after the first run: folders are only rescanned when they change
+
+@timed("sass gif")
 def show_sass_gif(folder_name):
-    target_folder = os.path.join(GIF_DIR, folder_name)
-    if not os.path.exists(target_folder): return
-    all_files = os.listdir(target_folder)
-    valid_images = [f for f in all_files if f.lower().endswith(('.gif', '.png', '.jpg', '.jpeg', '.webp'))]
-    if valid_images:
-        chosen = random.choice(valid_images)
-        st.image(os.path.join(target_folder, chosen), width=400)
+    chosen = pick_sass_gif(folder_name, GIF_DIR)
+    if chosen:
+        st.image(chosen, width=400)
+
+# --- BURN BOOK CARD FEED ---
+def build_card_feed_html(page_df):
+    # The whole page becomes one HTML string, built column-wise, so it ships as a single element
+    amt = pd.to_numeric(page_df["Amount"], errors="coerce").fillna(0.0)
+    money = amt.abs().map("{:.2f}".format)
+    is_neg = (amt < 0).to_numpy()
+    is_gold = (page_df["Category"] == "Reward").to_numpy() & ~is_neg
+    css_class = np.where(is_neg, "neg", np.where(is_gold, "gold", "pos"))
+    display_amt = np.where(is_neg, "-$" + money, np.where(is_gold, "+$" + money + " (Reward)", "+$" + money))
+    esc = lambda col: page_df[col].fillna("").astype(str).map(html.escape)
+    when = page_df["Date"].dt.strftime(DATE_FORMAT).fillna("")
+
+    cards = ('<div class="history-card ' + css_class + '">'
+             + '<div style="display:flex; justify-content:space-between;">'
+             + '<strong>' + esc("Item") + ' (' + esc("Category") + ')</strong>'
+             + '<span>' + when + '</span></div>'
+             + '<div style="font-size: 20px; font-weight: bold;">' + display_amt + '</div>'
+             + '<div style="font-style: italic; color: #888;">"' + esc("Sass_Level") + '"</div>'
+             + '</div>')
+    return "".join(cards)
+
+@timed("burn book feed")
+def show_card_feed(personal_df):
+    dates = personal_df["Date"]
+    first, last = (dates.min().date(), dates.max().date()) if dates.notna().any() else (None, None)
+
+    col_f1, col_f2, col_f3 = st.columns([2, 1, 1])
+    mask = np.ones(len(personal_df), dtype=bool)
+    if first:
+        with col_f1:
+            picked = st.date_input("Dates", value=(first, last), key="burn_book_dates")
+        if isinstance(picked, (tuple, list)) and len(picked) == 2:
+            mask = ((dates >= pd.Timestamp(picked[0])) & (dates < pd.Timestamp(picked[1] + timedelta(days=1)))).to_numpy()
+    with col_f2:
+        page_size = st.selectbox("Per page", BURN_BOOK_PAGE_SIZES, index=1, key="burn_book_page_size")
+
+    # Newest first, and only the rows on this page ever get turned into cards
+    positions = np.flatnonzero(mask)[::-1]
+    n_pages = max(1, math.ceil(len(positions) / page_size))
+    if st.session_state.get("burn_book_page", 1) > n_pages:
+        st.session_state["burn_book_page"] = n_pages
+    with col_f3:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="burn_book_page")
+
+    page_rows = personal_df.iloc[positions[(page - 1) * page_size: page * page_size]]
+    if page_rows.empty:
+        st.info("Nothing in those dates. She doesn't even go here.")
+        return
+    st.markdown(build_card_feed_html(page_rows), unsafe_allow_html=True)
+    st.caption(f"Page {page} of {n_pages} · {len(positions)} entries")
+
+# --- PERF PANEL ---
+def show_perf_panel(run):
+    st.sidebar.metric("⏱️ This rerun", f"{run['total_ms']:,.0f} ms")
+    st.sidebar.caption(f"{run['rows']:,} rows · {run['bytes_read'] / 1024:,.0f} KB read · {run['bytes_written'] / 1024:,.1f} KB written")
+    spans = pd.DataFrame(run["spans"])
+    if not spans.empty:
+        spans["name"] = spans["depth"].map(lambda d: "· " * d) + spans["name"]
+        st.sidebar.dataframe(spans.drop(columns="depth").set_index("name"), use_container_width=True)
+    totals = [r["total_ms"] for r in perf.recent_runs]
+    st.sidebar.caption(f"Last {len(totals)} reruns (all sessions): median {np.median(totals):,.0f} ms, worst {max(totals):,.0f} ms")
+
+# --- FRAGMENTS ---
+def view(name):
+    # Each tab / sub-view is an st.fragment: a widget inside it reruns just that function, not the
+    # whole script. Timed as a span on full reruns and as its own perf run on fragment reruns.
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_view(*args, **kwargs):
+            with perf.section(name):
+                return fn(*args, **kwargs)
+        return st.fragment(timed_view)
+    return wrap
 
 # --- MEAN GIRLS TEXT SASS ENGINE ---
 def get_sass(mood):
@@ -171,12 +256,398 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+# ==========================
+# TAB 1: THE PLASTICS (Clients)
+# ==========================
+@view("tab: The Plastics")
+def plastics_tab():
+    show_smart_banner("firm_banner", "The Plastics")
+
+    firm_sub_nav = st.radio("Menu:", ["📊 The Table", "📝 New Recruit", "💸 Transaction"], horizontal=True, label_visibility="collapsed", key="firm_sub_nav")
+    st.markdown("---")
+
+    if firm_sub_nav == "📊 The Table":
+        the_table()
+    elif firm_sub_nav == "📝 New Recruit":
+        new_recruit()
+    elif firm_sub_nav == "💸 Transaction":
+        transaction_desk()
+
+# A. DASHBOARD
+@view("The Table")
+def the_table():
+    existing_clients = STORE.client_names()
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        selected_client = st.selectbox("Who is sitting with us?", existing_clients, key="dash_client_select") if existing_clients else None
+
+    if selected_client:
+        client_stats = STORE.client_summary(selected_client)
+        bal = client_stats["balance"]
+        revenue = engine.revenue(STORE)
+        target = client_stats["target"]
+
+        col_a, col_b = st.columns(2)
+        col_a.metric(f"{selected_client}'s Stash", f"${bal:,.2f}")
+        col_b.metric(f"Your Cut ({engine.HOUSE_CUT:.0%})", f"${revenue:,.2f}")
+
+        st.markdown("### Progress")
+        if target > 0:
+            percent = bal / target
+            st.progress(min(percent, 1.0))
+            st.caption(f"Goal: ${target:,.2f} | Current: ${bal:,.2f}")
+            pig_pic = get_pig_image(percent * 100)
+            if pig_pic: st.image(pig_pic, width=150)
+            if percent >= 1.0:
+                show_sass_gif("good_math")
+                st.success("Is that a new goal? It's really pretty. 🎉")
+        else:
+            st.info("No goal. Social suicide.")
+
+        # Monte Carlo over her own deposit history; off by default like the rollup chart
+        if target > 0 and st.toggle("🔮 When will she get there?", key="dash_projection"):
+            band, odds = project_client(selected_client)
+            if odds["Status"] == "no deposits":
+                st.info("She's never deposited. Can't predict a ghost.")
+            elif band.empty:
+                st.info("Not enough history yet: her deposits all landed at once. Ask again after the next one.")
+            else:
+                st.line_chart(band)
+                basis = f"{projection.APP_PATHS:,} futures from her {odds['Deposits']} deposits, after your cut and her loans"
+                if odds["Status"] == "there":
+                    st.caption("She's already there.")
+                elif pd.isna(odds["Days_P50"]):
+                    st.caption(f"Probably not this year: {odds['Chance']:.0%} chance she hits ${target:,.0f} within a year ({basis}).")
+                else:
+                    likely = date.today() + timedelta(days=float(odds["Days_P50"]))
+                    st.caption(f"50/50 she hits ${target:,.0f} by **{likely:%b %d, %Y}**. "
+                               f"{odds['Chance']:.0%} chance within a year ({basis}).")
+            if st.checkbox("Everybody", key="dash_projection_book"):
+                counts, book = project_book()
+                st.bar_chart(counts, sort=False)
+                st.dataframe(book.sort_values("Chance", ascending=False), use_container_width=True, hide_index=True)
+
+        st.markdown("### The Burn Book (History)")
+        # Only the rows asked for come out of the store (binary search on her time index)
+        col_h1, col_h2 = st.columns([1, 2])
+        with col_h1:
+            history_mode = st.radio("Show", [f"Last {HISTORY_LAST_N}", "Date range"], horizontal=True, key="dash_history_mode")
+        if history_mode == "Date range":
+            today = date.today()
+            with col_h2:
+                picked = st.date_input("Dates", value=(today - timedelta(days=90), today), key="dash_history_dates")
+            picked = picked if isinstance(picked, (tuple, list)) else [picked]
+            start, end = picked[0], picked[-1]  # still picking: just that day
+            client_df = STORE.client_history(selected_client, start=start, end=end + timedelta(days=1))
+        else:
+            start = end = None
+            client_df = STORE.client_history(selected_client, last=HISTORY_LAST_N)
+        st.dataframe(client_df[["Date", "Type", "Amount", "Note", "Savings_Balance"]].iloc[::-1], use_container_width=True)
+
+        # Off by default: the chart is the priciest thing on the page
+        if st.toggle("📅 Weekly / Monthly", key="dash_rollup"):
+            period = st.radio("Roll up by", list(engine.ROLLUP_PERIODS), horizontal=True, key="dash_rollup_period")
+            rolled = engine.rollup(client_df, engine.ROLLUP_PERIODS[period])
+            if rolled.empty:
+                st.info("Nothing in there. She's a ghost.")
+            else:
+                st.bar_chart(rolled)
+                st.dataframe(rolled, use_container_width=True)
+                st.caption("Same rows as the history above.")
+
+        # Straight from the store to the browser a chunk at a time, never the whole ledger in memory
+        if st.toggle("📤 Export", key="dash_export"):
+            col_e1, col_e2 = st.columns(2)
+            with col_e1:
+                scope = st.radio("What", ["Her statement", "Whole ledger"], horizontal=True, key="dash_export_scope")
+            with col_e2:
+                fmt = EXPORT_FORMATS[st.radio("As", list(EXPORT_FORMATS), horizontal=True, key="dash_export_format")]
+            statement = scope == "Her statement"
+            client = selected_client if statement else None
+            file_name = exporter.export_name("ledger", client, start, end, fmt, statement)
+            if bank_api.api_up():
+                st.link_button(f"⬇️ {file_name}", bank_api.export_url(client=client, statement=statement, start=start, end=end, format=fmt))
+                st.caption("Streamed by the bank API: the download starts right away.")
+            else:
+                st.download_button(f"⬇️ {file_name}", key="dash_export_download", file_name=file_name,
+                                   mime=exporter.FORMATS[fmt], on_click="ignore",
+                                   data=lambda: b"".join(exporter.stream_export(STORE, "ledger", client, start, end, fmt, statement)))
+                st.caption("Built when you click. For big extracts run `python bank_api.py` and this streams instead.")
+            st.caption("Dates: " + (f"{start} to {end}" if start else "all of them") + ", same as the history above.")
+    else:
+        st.info("No clients yet. Add a Recruit!")
+
+# B. ADD CLIENT
+@view("New Recruit")
+def new_recruit():
+    st.subheader("Plastic Onboarding")
+    with st.form("onboarding_form"):
+        new_name = st.text_input("1. Name (Are they cool?)", key="new_client_name")
+        col_q1, col_q2 = st.columns(2)
+        with col_q1: new_goal = st.number_input("Savings Goal ($)", value=100.0, key="new_client_goal")
+        with col_q2: new_freq = st.selectbox("Frequency", ["Weekly", "Bi-Weekly", "Whenever"], key="new_client_freq")
+
+        if st.form_submit_button("Make them a Plastic"):
+            existing_clients = STORE.client_names()
+            if new_name and new_name not in existing_clients:
+                save_posting(engine.open_account(new_name, target=new_goal, frequency=new_freq))
+                st.success(f"{new_name} can sit with us.")
+                show_sass_gif("burn_book")
+                st.balloons()
+            elif new_name in existing_clients:
+                st.error("She doesn't even go here! (Already exists)")
+
+# C. TRANSACTION
+@view("Transaction")
+def transaction_desk():
+    existing_clients = STORE.client_names()
+    if not existing_clients:
+        st.warning("No clients.")
+        return
+
+    c_client = st.selectbox("Client", existing_clients, key="trans_client_select")
+    c_action = st.radio("Action", ["Deposit", "Loan (Gross)", "Penalty (Late)"], horizontal=True, key="trans_action_select")
+
+    # DEPOSIT
+    if c_action == "Deposit":
+        c_amount = st.number_input("Amount", value=10.00, key="trans_deposit_amount")
+        st.write(f"**Mathletes Tryout:** {engine.HOUSE_CUT:.0%} of ${c_amount}?")
+        guess = st.number_input("Answer:", value=0.0, key="trans_deposit_guess")
+        if st.button("Secure the Bag"):
+            got_it = engine.math_checks_out(guess, engine.house_cut(c_amount))
+            note = "Deposit (So Fetch)" if got_it else "Deposit (Fixed)"
+
+            if got_it:
+                st.balloons()
+                show_sass_gif("good_math")
+                st.success(get_sass("good_math"))
+            else:
+                show_sass_gif("bad_math")
+                st.error(get_sass("bad_math"))
+
+            save_posting(engine.deposit(c_client, c_amount, note))
+
+    # WITHDRAWAL
+    elif c_action == "Loan (Gross)":
+        c_amount = st.number_input("Loan Amount", value=10.00, key="trans_loan_amount")
+        st.warning("⚠️ Warning: This will ruin their Piggy Bank status.")
+        if st.button("Give Loan"):
+            show_sass_gif("spent")
+            save_posting(engine.loan(c_client, c_amount))
+            st.success("Processed. Whatever, I'm getting cheese fries.")
+
+    # PENALTY
+    elif c_action == "Penalty (Late)":
+        st.subheader("💀 Late Fee")
+        days_late = st.number_input("Days Late", min_value=1, value=1, key="trans_penalty_days")
+        total_fee = engine.late_fee(days_late)
+
+        st.write(f"**Mathletes:** ${engine.LATE_FEE_PER_DAY:.2f} x {days_late} days = ?")
+        fee_guess = st.number_input("Your Calculation:", value=0.00, key="trans_penalty_guess")
+
+        col_p1, col_p2 = st.columns(2)
+        with col_p1:
+            if st.button("Charge it 💅"):
+                if engine.math_checks_out(fee_guess, total_fee):
+                    save_posting(engine.penalty(c_client, days_late))
+                    show_sass_gif("burn_book")
+                    st.success("The limit does not exist!")
+                else:
+                    st.error("Wrong math. Charged anyway.")
+                    show_sass_gif("bad_math")
+                    save_posting(engine.penalty(c_client, days_late))
+        with col_p2:
+            if st.button("Waive it (Be Nice) 😇"):
+                save_posting(engine.waive(c_client))
+                st.balloons()
+                show_sass_gif("good_math")
+                st.success("You are a cool mom.")
+
+        # Everyone at once, off their Frequency (same pass as `python scheduler.py --charge`)
+        if st.toggle("⏰ Roll call: who's late?", key="trans_roll_call"):
+            sched, penalties, _ = scheduler.run_schedule(STORE, charge=True, remind=False, dry_run=True)
+            late = sched[sched["Status"] == "late"].sort_values("Days_Late", ascending=False)
+            if late.empty:
+                st.success("Nobody's late. Grool.")
+            else:
+                st.dataframe(late[["Client", "Frequency", "Due", "Days_Late", "Unbilled_Days"]], hide_index=True, use_container_width=True)
+                if penalties and st.button(f"Charge all {len(penalties)} (${sum(p.amount for p in penalties):,.2f}) 💀"):
+                    scheduler.run_schedule(STORE, charge=True, remind=False)
+                    show_sass_gif("burn_book")
+                    st.success("Fees charged. She doesn't even go here.")
+
+# ==========================
+# TAB 2: WORLD DOMINATION (Empire)
+# ==========================
+@timed("shopping money")
+def shopping_money():
+    # Revenue + Burn Book - goals, from running totals the save functions keep up (see totals.py)
+    return engine.shopping_money(STORE)
+
+@view("tab: World Domination")
+def empire_tab():
+    show_smart_banner("banner", "👑 World Domination")
+    quote = get_daily_content(QUOTES_FILE, "DailyMotoQuote", "Get in loser, we're going shopping.")
+    st.caption(f"Gossip: {quote}")
+
+    empire_nav = st.radio("Menu:", ["🏆 Spring Fling Goals", "💸 Money Mover", "📜 The Burn Book"], horizontal=True, label_visibility="collapsed", key="empire_nav")
+    st.markdown("---")
+
+    if empire_nav == "🏆 Spring Fling Goals":
+        spring_fling_goals()
+    elif empire_nav == "💸 Money Mover":
+        money_mover()
+    elif empire_nav == "📜 The Burn Book":
+        burn_book()
+
+@view("Spring Fling Goals")
+def spring_fling_goals():
+    goals_df = load_goals()
+    st.metric("💵 Shopping Money", f"${shopping_money():,.2f}")
+    cols = st.columns(3)
+    goal_percents = (goals_df['Balance'] / goals_df['Target']).where(goals_df['Target'] > 0, 0)
+    goal_pigs = get_pig_images((goal_percents * 100).tolist())
+    for index, row in goals_df.iterrows():
+        with cols[index]:
+            st.markdown(f"### {row['Name']}")
+            percent = goal_percents[index]
+            st.progress(min(percent, 1.0))
+            st.write(f"${row['Balance']:.0f} / ${row['Target']:.0f}")
+            pig_pic = goal_pigs[index]
+            if pig_pic: st.image(pig_pic, width=150)
+
+    with st.expander("Edit Goals"):
+        e_goal = st.selectbox("Goal", goals_df["Name"], key="empire_edit_goal")
+        new_n = st.text_input("New Name", key="empire_edit_name")
+        new_t = st.number_input("New Target", value=100.0, key="empire_edit_target")
+        if st.button("Update Goal"):
+            idx = goals_df.index[goals_df['Name'] == e_goal].tolist()[0]
+            goals_df.at[idx, 'Name'] = new_n if new_n else e_goal
+            goals_df.at[idx, 'Target'] = new_t
+            engine.replace_table(STORE, "goals", goals_df)
+            st.rerun()
+
+    with st.expander("🧮 Recount"):
+        st.caption("Shopping Money comes from running totals. This re-adds everything from scratch.")
+        if st.button("Recount from scratch"):
+            for part, (running, fresh, drift) in engine.reconcile(STORE).items():
+                if drift:
+                    st.warning(f"{part}: was ${running:,.2f}, actually ${fresh:,.2f}. Fixed.")
+            st.success("The books are balanced. So fetch.")
+
+@view("Money Mover")
+def money_mover():
+    # Typing an amount reruns just this: goals for the dropdowns, cash checks off the running totals
+    goals_df = load_goals()
+    st.subheader("Move Money")
+    move_type = st.selectbox("Action", ["Deposit Cash (Gift)", "Shopping Spree", "Save to Goal", "Withdraw from Goal"], key="empire_move_type")
+    amt = st.number_input("Amount", value=10.0, key="empire_move_amt")
+
+    # 1. DEPOSIT
+    if move_type == "Deposit Cash (Gift)":
+        source = st.text_input("From who?", "Nana", key="empire_dep_source")
+        if st.button("Add Cash"):
+            save_personal_transaction("Income", source, amt, get_sass("gift"))
+            st.balloons()
+            show_sass_gif("saved")
+            st.rerun()
+
+    # 2. SAVE TO GOAL
+    elif move_type == "Save to Goal":
+        goal = st.selectbox("To Goal", goals_df["Name"], key="empire_save_goal")
+        if st.button("Save"):
+            try:
+                move_goal_money(engine.save_to_goal(goal, amt, shopping_money()), get_sass("saving"))
+            except ValueError as e:  # not enough cash, or the goal changed under us; nothing was written
+                st.error(str(e))
+            else:
+                st.balloons()
+                show_sass_gif("saved")
+                st.rerun()
+
+    # 3. SPENDING
+    elif move_type == "Shopping Spree":
+        item = st.text_input("What did you buy?", key="empire_spend_item")
+        if st.button("Spend"):
+            if amt <= shopping_money():
+                save_personal_transaction("Spending", item, amt, get_sass("spending"))
+                show_sass_gif("spent")
+                st.rerun()
+            else: st.error("Insufficient funds.")
+
+    # 4. WITHDRAW FROM GOAL (This was missing!)
+    elif move_type == "Withdraw from Goal":
+        goal = st.selectbox("From Goal", goals_df["Name"], key="empire_withdraw_goal")
+        if st.button("Withdraw to Cash"):
+            goal_row = goals_df[goals_df["Name"] == goal].iloc[0]
+            try:
+                move_goal_money(engine.withdraw_from_goal(goal, amt, goal_row["Balance"]), get_sass("early_withdraw"))
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                show_sass_gif("early_withdraw")
+                st.warning("Processed. Don't spend it all in one place.")
+                st.rerun()
+
+@view("The Burn Book")
+def burn_book():
+    personal_df = load_personal_data()
+    st.write("### Your Personal Ledger")
+
+    # HIDDEN EDITOR (one page at a time, newest page first)
+    with st.expander("✎ Edit Entries (Fix Mistakes)"):
+        n_pages = max(1, math.ceil(len(personal_df) / EDITOR_PAGE_SIZE))
+        if st.session_state.get("empire_editor_page", 1) > n_pages:
+            st.session_state["empire_editor_page"] = n_pages
+        page = st.number_input("Page (1 = newest)", min_value=1, max_value=n_pages, step=1, key="empire_editor_page")
+        end = len(personal_df) - (page - 1) * EDITOR_PAGE_SIZE
+        start = max(0, end - EDITOR_PAGE_SIZE)
+        window = personal_df.iloc[start:end]
+        # Keyed on the rows it shows: if the window moves (new entries), half-done edits are dropped
+        # rather than landing on the wrong rows
+        editor_key = f"empire_editor_{start}_{end}"
+        st.data_editor(window, num_rows="dynamic", key=editor_key)
+        st.caption(f"Rows {start + 1}-{end} of {len(personal_df)}")
+        if st.button("Save Changes"):
+            try:
+                changed = save_budget_edits(window, st.session_state[editor_key])
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Burn Book Updated. ({changed} rows)")
+                st.rerun()
+
+    st.markdown("---")
+
+    # COLORFUL CARD FEED (paginated)
+    if not personal_df.empty:
+        show_card_feed(personal_df)
+    else:
+        st.info("The book is empty. Go buy something.")
+
+# ==========================
+# TAB 3: THE RULES
+# ==========================
+def rules_tab():
+    st.title("📕 The Rules of Feminism")
+    st.markdown("""
+    ### 1. The Plastics (Clients)
+    - You are the Queen Bee. They save money, you take **15%**.
+    - If they are late, you charge them **$5/day**.
+    - If you feel like a Cool Mom, you can waive the fee.
+
+    ### 2. World Domination (Goals)
+    - **The Pig:** As you save, the pig fills up. It's like, the rules of physics.
+    - **Shopping Money:** This is your cash. Don't spend it all at once.
+    """)
+
 # --- INTRO LOGIC ---
 if 'intro_seen' not in st.session_state:
     st.session_state['intro_seen'] = False
 
 if not st.session_state['intro_seen']:
-    is_first_run = not os.path.exists(CLIENT_FILE)
+    is_first_run = not STORE.exists("ledger")
     if is_first_run:
         st.balloons()
         st.title("💋 Get in Loser, We're Doing Accounting.")
@@ -185,290 +656,31 @@ if not st.session_state['intro_seen']:
             st.session_state['intro_seen'] = True
             st.rerun()
     else:
-        daily_fact = get_daily_content(FACTS_FILE, "Daily Gossip", "On Wednesdays we wear pink.")
+        daily_fact = get_daily_content(FACTS_FILE, "Fun Fact", "On Wednesdays we wear pink.")
         st.markdown(f"### 💋 Gossip: {daily_fact}")
         if st.button("✨ Enter World Domination ✨"):
             st.session_state['intro_seen'] = True
             st.rerun()
 
+
 # --- MAIN NAVIGATION ---
 else:
-    tab_firm, tab_empire, tab_help = st.tabs(["💅 The Plastics (Clients)", "👑 World Domination", "📕 The Rules"])
-
-    # ==========================
-    # TAB 1: THE PLASTICS (Clients)
-    # ==========================
-    with tab_firm:
-        show_smart_banner("firm_banner", "The Plastics")
-        
-        firm_sub_nav = st.radio("Menu:", ["📊 The Table", "📝 New Recruit", "💸 Transaction"], horizontal=True, label_visibility="collapsed")
-        st.markdown("---")
-
-        df = load_client_data()
-        existing_clients = df["Client"].unique().tolist() if not df.empty else []
-        
-        # A. DASHBOARD
-        if firm_sub_nav == "📊 The Table":
-            col1, col2 = st.columns([1, 2])
-            with col1:
-                selected_client = st.selectbox("Who is sitting with us?", existing_clients, key="dash_client_select") if existing_clients else None
-            
-            if selected_client:
-                client_df = df[df["Client"] == selected_client]
-                bal = client_df.iloc[-1]["Savings_Balance"] if not client_df.empty else 0.0
-                revenue = df["Niece_Earnings"].sum()
-                
-                try: target = client_df["Target"].max()
-                except: target = 0
-                
-                col_a, col_b = st.columns(2)
-                col_a.metric(f"{selected_client}'s Stash", f"${bal:,.2f}")
-                col_b.metric("Your Cut (15%)", f"${revenue:,.2f}")
-                
-                st.markdown("### Progress")
-                if target > 0:
-                    percent = bal / target
-                    st.progress(min(percent, 1.0))
-                    st.caption(f"Goal: ${target:,.2f} | Current: ${bal:,.2f}")
-                    pig_pic = get_pig_image(percent * 100)
-                    if pig_pic: st.image(pig_pic, width=150)
-                    if percent >= 1.0: 
-                        show_sass_gif("good_math") 
-                        st.success("Is that a new goal? It's really pretty. 🎉")
-                else:
-                    st.info("No goal. Social suicide.")
-                
-                st.markdown("### The Burn Book (History)")
-                st.dataframe(client_df[["Date", "Type", "Amount", "Note", "Savings_Balance"]].sort_index(ascending=False), use_container_width=True)
-            else:
-                st.info("No clients yet. Add a Recruit!")
-
-        # B. ADD CLIENT
-        elif firm_sub_nav == "📝 New Recruit":
-            st.subheader("Plastic Onboarding")
-            with st.form("onboarding_form"):
-                new_name = st.text_input("1. Name (Are they cool?)", key="new_client_name")
-                col_q1, col_q2 = st.columns(2)
-                with col_q1: new_goal = st.number_input("Savings Goal ($)", value=100.0, key="new_client_goal")
-                with col_q2: new_freq = st.selectbox("Frequency", ["Weekly", "Bi-Weekly", "Whenever"], key="new_client_freq")
-                
-                if st.form_submit_button("Make them a Plastic"):
-                    if new_name and new_name not in existing_clients:
-                        save_client_transaction(new_name, "Open", 0, "Joined the Clique", 0, 0, target=new_goal, freq=new_freq)
-                        st.success(f"{new_name} can sit with us.")
-                        show_sass_gif("burn_book") 
-                        st.balloons()
-                    elif new_name in existing_clients:
-                        st.error("She doesn't even go here! (Already exists)")
-
-        # C. TRANSACTION
-        elif firm_sub_nav == "💸 Transaction":
-            if not existing_clients:
-                st.warning("No clients.")
-            else:
-                c_client = st.selectbox("Client", existing_clients, key="trans_client_select")
-                c_action = st.radio("Action", ["Deposit", "Loan (Gross)", "Penalty (Late)"], horizontal=True, key="trans_action_select")
-                
-                # DEPOSIT
-                if c_action == "Deposit":
-                    c_amount = st.number_input("Amount", value=10.00, key="trans_deposit_amount")
-                    st.write(f"**Mathletes Tryout:** 15% of ${c_amount}?")
-                    guess = st.number_input("Answer:", value=0.0, key="trans_deposit_guess")
-                    if st.button("Secure the Bag"):
-                        real_earn = round(c_amount * 0.15, 2)
-                        client_save = c_amount - real_earn
-                        note = "Deposit (So Fetch)" if abs(guess - real_earn) < 0.01 else "Deposit (Fixed)"
-                        
-                        if abs(guess - real_earn) < 0.01: 
-                            st.balloons()
-                            show_sass_gif("good_math") 
-                            st.success(get_sass("good_math"))
-                        else:
-                            show_sass_gif("bad_math") 
-                            st.error(get_sass("bad_math"))
-                        
-                        save_client_transaction(c_client, "Deposit", c_amount, note, client_save, real_earn)
-                
-                # WITHDRAWAL
-                elif c_action == "Loan (Gross)":
-                    c_amount = st.number_input("Loan Amount", value=10.00, key="trans_loan_amount")
-                    st.warning("⚠️ Warning: This will ruin their Piggy Bank status.")
-                    if st.button("Give Loan"):
-                        show_sass_gif("spent") 
-                        save_client_transaction(c_client, "Withdrawal", c_amount, "Client Loan", -c_amount, 0)
-                        st.success("Processed. Whatever, I'm getting cheese fries.")
-                
-                # PENALTY
-                elif c_action == "Penalty (Late)":
-                    st.subheader("💀 Late Fee")
-                    days_late = st.number_input("Days Late", min_value=1, value=1, key="trans_penalty_days")
-                    total_fee = days_late * 5.00
-                    
-                    st.write(f"**Mathletes:** $5.00 x {days_late} days = ?")
-                    fee_guess = st.number_input("Your Calculation:", value=0.00, key="trans_penalty_guess")
-                    
-                    col_p1, col_p2 = st.columns(2)
-                    with col_p1:
-                        if st.button("Charge it 💅"):
-                            if abs(fee_guess - total_fee) < 0.01:
-                                save_client_transaction(c_client, "Penalty", total_fee, "Late Fee", 0, total_fee)
-                                show_sass_gif("burn_book") 
-                                st.success("The limit does not exist!")
-                            else:
-                                st.error("Wrong math. Charged anyway.")
-                                show_sass_gif("bad_math") 
-                                save_client_transaction(c_client, "Penalty", total_fee, "Late Fee", 0, total_fee)
-                    with col_p2:
-                        if st.button("Waive it (Be Nice) 😇"):
-                            save_client_transaction(c_client, "Waived", 0, "Fee Waived", 0, 0)
-                            st.balloons()
-                            show_sass_gif("good_math") 
-                            st.success("You are a cool mom.")
-
-    # ==========================
-    # TAB 2: WORLD DOMINATION (Empire)
-    # ==========================
-    with tab_empire:
-        show_smart_banner("banner", "👑 World Domination")
-        quote = get_daily_content(QUOTES_FILE, "DailyMotoQuote", "Get in loser, we're going shopping.")
-        st.caption(f"Gossip: {quote}")
-        
-        empire_nav = st.radio("Menu:", ["🏆 Spring Fling Goals", "💸 Money Mover", "📜 The Burn Book"], horizontal=True, label_visibility="collapsed")
-        st.markdown("---")
-        
-        personal_df = load_personal_data()
-        goals_df = load_goals()
-        client_df = load_client_data()
-        
-        total_earned = client_df["Niece_Earnings"].sum() if not client_df.empty else 0.0
-        total_in_goals = goals_df["Balance"].sum()
-        available_cash = total_earned + personal_df["Amount"].sum() - total_in_goals
-
-        if empire_nav == "🏆 Spring Fling Goals":
-            st.metric("💵 Shopping Money", f"${available_cash:,.2f}")
-            cols = st.columns(3)
-            for index, row in goals_df.iterrows():
-                with cols[index]:
-                    st.markdown(f"### {row['Name']}")
-                    percent = row['Balance'] / row['Target'] if row['Target'] > 0 else 0
-                    st.progress(min(percent, 1.0))
-                    st.write(f"${row['Balance']:.0f} / ${row['Target']:.0f}")
-                    pig_pic = get_pig_image(percent * 100)
-                    if pig_pic: st.image(pig_pic, width=150)
-            
-            with st.expander("Edit Goals"):
-                e_goal = st.selectbox("Goal", goals_df["Name"], key="empire_edit_goal")
-                new_n = st.text_input("New Name", key="empire_edit_name")
-                new_t = st.number_input("New Target", value=100.0, key="empire_edit_target")
-                if st.button("Update Goal"):
-                    idx = goals_df.index[goals_df['Name'] == e_goal].tolist()[0]
-                    goals_df.at[idx, 'Name'] = new_n if new_n else e_goal
-                    goals_df.at[idx, 'Target'] = new_t
-                    goals_df.to_csv(GOALS_FILE, index=False)
-                    st.rerun()
-
-        elif empire_nav == "💸 Money Mover":
-            st.subheader("Move Money")
-            move_type = st.selectbox("Action", ["Deposit Cash (Gift)", "Shopping Spree", "Save to Goal", "Withdraw from Goal"], key="empire_move_type")
-            amt = st.number_input("Amount", value=10.0, key="empire_move_amt")
-            
-            # 1. DEPOSIT
-            if move_type == "Deposit Cash (Gift)":
-                source = st.text_input("From who?", "Nana", key="empire_dep_source")
-                if st.button("Add Cash"):
-                    save_personal_transaction("Income", source, amt, get_sass("gift"))
-                    st.balloons()
-                    show_sass_gif("saved") 
-                    st.rerun()
-            
-            # 2. SAVE TO GOAL
-            elif move_type == "Save to Goal":
-                goal = st.selectbox("To Goal", goals_df["Name"], key="empire_save_goal")
-                if st.button("Save"):
-                    if amt <= available_cash:
-                        update_goal(goal, amt)
-                        save_personal_transaction("Savings Transfer", f"Saved to {goal}", 0, get_sass("saving"))
-                        st.balloons()
-                        show_sass_gif("saved") 
-                        st.rerun()
-                    else: st.error("You have no money. Boo.")
-            
-            # 3. SPENDING
-            elif move_type == "Shopping Spree":
-                item = st.text_input("What did you buy?", key="empire_spend_item")
-                if st.button("Spend"):
-                    if amt <= available_cash:
-                        save_personal_transaction("Spending", item, amt, get_sass("spending"))
-                        show_sass_gif("spent") 
-                        st.rerun()
-                    else: st.error("Insufficient funds.")
-
-            # 4. WITHDRAW FROM GOAL (This was missing!)
-            elif move_type == "Withdraw from Goal":
-                goal = st.selectbox("From Goal", goals_df["Name"], key="empire_withdraw_goal")
-                if st.button("Withdraw to Cash"):
-                    goal_row = goals_df[goals_df["Name"] == goal].iloc[0]
-                    if amt > goal_row["Balance"]:
-                        st.error("You don't have that much saved!")
-                    else:
-                        update_goal(goal, -amt)
-                        save_personal_transaction("Early Withdrawal", f"Took from {goal}", 0, get_sass("early_withdraw"))
-                        show_sass_gif("early_withdraw")
-                        st.warning("Processed. Don't spend it all in one place.")
-                        st.rerun()
-
-        elif empire_nav == "📜 The Burn Book":
-            st.write("### Your Personal Ledger")
-            
-            # HIDDEN EDITOR
-            with st.expander("✎ Edit Entries (Fix Mistakes)"):
-                edited_df = st.data_editor(personal_df, num_rows="dynamic", key="empire_editor")
-                if st.button("Save Changes"):
-                    save_personal_data(edited_df)
-                    st.success("Burn Book Updated.")
-                    st.rerun()
-            
-            st.markdown("---")
-            
-            # COLORFUL CARD FEED
-            if not personal_df.empty:
-                for index, row in personal_df.sort_index(ascending=False).iterrows():
-                    amt = row['Amount']
-                    css_class = "pos"  # Default Green (Fetch)
-                    display_amt = f"+${abs(amt):.2f}"
-                    
-                    if amt < 0:
-                        css_class = "neg" # Red (Gross)
-                        display_amt = f"-${abs(amt):.2f}"
-                    elif row['Category'] == "Reward":
-                        css_class = "gold"
-                        display_amt = f"+${abs(amt):.2f} (Reward)"
-                    
-                    st.markdown(f"""
-                    <div class="history-card {css_class}">
-                        <div style="display:flex; justify-content:space-between;">
-                            <strong>{row['Item']} ({row['Category']})</strong>
-                            <span>{row['Date']}</span>
-                        </div>
-                        <div style="font-size: 20px; font-weight: bold;">{display_amt}</div>
-                        <div style="font-style: italic; color: #888;">"{row['Sass_Level']}"</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                st.info("The book is empty. Go buy something.")
-
-    # ==========================
-    # TAB 3: THE RULES
-    # ==========================
-    with tab_help:
-        st.title("📕 The Rules of Feminism")
-        st.markdown("""
-        ### 1. The Plastics (Clients)
-        - You are the Queen Bee. They save money, you take **15%**.
-        - If they are late, you charge them **$5/day**.
-        - If you feel like a Cool Mom, you can waive the fee.
-        
-        ### 2. World Domination (Goals)
-        - **The Pig:** As you save, the pig fills up. It's like, the rules of physics.
-        - **Shopping Money:** This is your cash. Don't spend it all at once.
-        """)
\ No newline at end of file
+    cache_stats = LOADER_CACHE.stats()
+    st.sidebar.caption(f"🧠 Loader cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+
+    # Lazy tabs: switching tabs is a rerun and only the open tab's body runs (and loads its data)
+    tab_firm, tab_empire, tab_help = st.tabs(["💅 The Plastics (Clients)", "👑 World Domination", "📕 The Rules"], key="main_tab", on_change="rerun")
+    if tab_firm.open:
+        with tab_firm:
+            plastics_tab()
+    if tab_empire.open:
+        with tab_empire:
+            empire_tab()
+    if tab_help.open:
+        with tab_help, span("tab: The Rules"):
+            rules_tab()
+
+# --- PERF WRAP-UP ---
+perf_run = perf.finish_run()
+if perf_run and st.sidebar.toggle("⏱️ Perf panel", key="perf_panel"):
+    show_perf_panel(perf_run)
@@ -0,0 +1,322 @@
+import math
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from storage import CLIENT_COLUMNS, DATE_FORMAT
+from totals import get_totals
+
+# --- THE BANK ENGINE ---
+# The rules of the bank with no Streamlit anywhere near them: the 15% cut, $5/day late fees,
+# goal transfers and the shopping-money math. Both apps (bank_app.py and Maya_Gift/bank_app.py),
+# bulk_import.py and bank_api.py go through here, so a rule only ever changes in one place.
+# The functions up top are pure; the ones under STORE BINDINGS hand the results to a store and
+# keep its running totals (totals.py) in step.
+
+HOUSE_CUT = 0.15
+LATE_FEE_PER_DAY = 5.00
+MATH_TOLERANCE = 0.01
+
+# Budget categories that take money out of your pocket. Amounts in these are stored negative;
+# older files (Maya_Gift) stored them positive, so the math always uses -abs(amount).
+OUTFLOW_CATEGORIES = ("Spending", "Withdraw from Savings", "Early Withdrawal", "Savings Goal")
+
+TYPE_ALIASES = {
+    "deposit": "Deposit",
+    "loan": "Withdrawal", "loan (gross)": "Withdrawal", "withdrawal": "Withdrawal",
+    "penalty": "Penalty", "penalty (late)": "Penalty", "late fee": "Penalty",
+    "waived": "Waived", "fee waived": "Waived",
+    "open": "Open",
+}
+DEFAULT_NOTES = {
+    "Deposit": "Deposit (Paper Records)", "Withdrawal": "Client Loan", "Penalty": "Late Fee",
+    "Waived": "Fee Waived", "Open": "Joined the Clique",
+}
+
+
+class InsufficientFunds(ValueError):
+    pass
+
+
+def _stamp(now=None):
+    return (now or datetime.now()).strftime(DATE_FORMAT)
+
+
+# --- THE TRANSACTION MODEL ---
+@dataclass(frozen=True)
+class Posting:
+    client: str
+    type: str
+    amount: float
+    note: str
+    savings_change: float   # what it does to the client's Savings_Balance
+    earnings: float         # your cut (Niece_Earnings)
+    target: float = 0.0
+    frequency: str = ""
+    date: str = ""          # "" -> stamped when posted
+
+    def to_row(self, now=None):
+        # Savings_Balance is left for the store to fill in at commit time
+        return {
+            "Date": self.date or _stamp(now), "Client": self.client, "Type": self.type,
+            "Amount": self.amount, "Note": self.note, "Savings_Balance": None,
+            "Niece_Earnings": self.earnings, "Target": self.target, "Frequency": self.frequency,
+        }
+
+
+@dataclass(frozen=True)
+class GoalTransfer:
+    goal: str
+    change: float           # + into the goal, - out of it
+    category: str           # the Burn Book line that goes with it
+    item: str
+
+
+# --- CLIENT RULES ---
+def house_cut(amount):
+    return round(amount * HOUSE_CUT, 2)
+
+def late_fee(days_late):
+    return days_late * LATE_FEE_PER_DAY
+
+def math_checks_out(guess, answer):
+    return abs(guess - answer) < MATH_TOLERANCE
+
+def open_account(client, target=0.0, frequency="", note="Joined the Clique"):
+    return Posting(client, "Open", 0.0, note, 0.0, 0.0, target=target, frequency=frequency)
+
+def deposit(client, amount, note="Deposit"):
+    cut = house_cut(amount)
+    return Posting(client, "Deposit", amount, note, amount - cut, cut)
+
+def loan(client, amount, note="Client Loan", balance=None):
+    # Pass balance to refuse loans bigger than what she has saved
+    if balance is not None and amount > balance:
+        raise InsufficientFunds("Insufficient funds!")
+    return Posting(client, "Withdrawal", amount, note, -amount, 0.0)
+
+def penalty(client, days_late, note="Late Fee"):
+    fee = late_fee(days_late)
+    return Posting(client, "Penalty", fee, note, 0.0, fee)
+
+def waive(client, note="Fee Waived"):
+    return Posting(client, "Waived", 0.0, note, 0.0, 0.0)
+
+
+def posting_from_record(record):
+    # One dict (an API request row, say) -> Posting. Same aliases and defaults as prepare_postings,
+    # but plain Python: for a handful of rows that's far cheaper than building a frame.
+    client = str(record.get("Client") or "").strip()
+    if not client:
+        raise ValueError("Every row needs a Client")
+    kind = TYPE_ALIASES.get(str(record.get("Type", "")).strip().lower())
+    if kind is None:
+        raise ValueError(f"Unknown transaction type: {record.get('Type')!r}")
+    amount = record.get("Amount")
+    if kind == "Penalty" and record.get("Days_Late") is not None:
+        amount = late_fee(float(record["Days_Late"]))
+    if amount is None and kind in ("Waived", "Open"):
+        amount = 0.0
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        amount = math.nan
+    if math.isnan(amount):
+        raise ValueError(f"Missing or non-numeric Amount for {client}")
+    date = ""
+    if record.get("Date"):
+        try:
+            date = _stamp(datetime.fromisoformat(str(record["Date"])))
+        except ValueError:
+            raise ValueError(f"Unreadable Date: {record['Date']!r}")
+
+    note = record.get("Note") or DEFAULT_NOTES[kind]
+    if kind == "Deposit":
+        posting = deposit(client, amount, note)
+    elif kind == "Withdrawal":
+        posting = loan(client, amount, note)
+    elif kind == "Penalty":
+        posting = Posting(client, "Penalty", amount, note, 0.0, amount)
+    else:
+        posting = Posting(client, kind, amount, note, 0.0, 0.0)
+    return replace(posting, target=float(record.get("Target") or 0.0),
+                   frequency=str(record.get("Frequency") or ""), date=date)
+
+
+# --- VECTORIZED RULES (bulk imports, ledger checks) ---
+def savings_changes(types, amounts):
+    # How much each row moves the client's Savings_Balance: deposits net of the cut, loans out, the rest 0
+    amounts = pd.to_numeric(pd.Series(amounts), errors="coerce").fillna(0.0).to_numpy()
+    types = pd.Series(types).to_numpy()
+    return np.select([types == "Deposit", types == "Withdrawal"],
+                     [amounts - np.round(amounts * HOUSE_CUT, 2), -amounts], 0.0)
+
+def prepare_postings(records, now=None):
+    # records: a frame with Client, Type, Amount and optionally Date, Note, Days_Late, Target, Frequency.
+    # Returns (ledger rows without Savings_Balance, savings change per row), in date order.
+    df = records.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    for col in ("Client", "Type"):
+        if col not in df.columns:
+            raise ValueError(f"Missing required column: {col}")
+
+    df["Client"] = df["Client"].astype(str).str.strip()
+    df["Type"] = df["Type"].astype(str).str.strip().str.lower().map(TYPE_ALIASES)
+    if df["Type"].isna().any():
+        bad = records.loc[df["Type"].isna(), "Type"].unique().tolist()
+        raise ValueError(f"Unknown transaction type(s): {bad}")
+    if (df["Client"] == "").any() or records["Client"].isna().any():
+        raise ValueError("Every row needs a Client")
+
+    amount = pd.to_numeric(df["Amount"], errors="coerce") if "Amount" in df.columns else pd.Series(np.nan, index=df.index)
+    is_penalty = df["Type"] == "Penalty"
+    if "Days_Late" in df.columns:
+        days = pd.to_numeric(df["Days_Late"], errors="coerce")
+        amount = amount.where(~(is_penalty & days.notna()), days * LATE_FEE_PER_DAY)
+    amount = amount.where(~df["Type"].isin(["Waived", "Open"]), amount.fillna(0.0))
+    if amount.isna().any():
+        raise ValueError(f"Missing or non-numeric Amount on row(s): {(amount[amount.isna()].index + 1).tolist()}")
+
+    is_deposit = df["Type"] == "Deposit"
+    earnings = np.where(is_deposit, (amount * HOUSE_CUT).round(2), np.where(is_penalty, amount, 0.0))
+    savings_change = savings_changes(df["Type"], amount)
+
+    if "Date" in df.columns:
+        dates = pd.to_datetime(df["Date"], errors="coerce")
+        if dates.isna().any():
+            raise ValueError(f"Unreadable Date on row(s): {(dates[dates.isna()].index + 1).tolist()}")
+        dates = dates.dt.strftime(DATE_FORMAT)
+    else:
+        dates = pd.Series(_stamp(now), index=df.index)
+
+    note = df["Note"] if "Note" in df.columns else pd.Series(np.nan, index=df.index)
+    ledger = pd.DataFrame({
+        "Date": dates,
+        "Client": df["Client"],
+        "Type": df["Type"],
+        "Amount": amount.astype(float),
+        "Note": note.fillna(df["Type"].map(DEFAULT_NOTES)),
+        "Savings_Balance": np.nan,
+        "Niece_Earnings": earnings,
+        "Target": pd.to_numeric(df["Target"], errors="coerce").fillna(0.0) if "Target" in df.columns else 0.0,
+        "Frequency": df["Frequency"].fillna("") if "Frequency" in df.columns else "",
+    }, columns=CLIENT_COLUMNS)
+
+    # Ledger order is chronological; keep the input's order for rows with the same timestamp
+    order = np.argsort(ledger["Date"].to_numpy(), kind="stable")
+    return ledger.iloc[order].reset_index(drop=True), pd.Series(savings_change[order])
+
+
+# --- HISTORY ROLLUPS ---
+ROLLUP_PERIODS = {"Weekly": "W", "Monthly": "M"}
+
+def rollup(history, period="M"):
+    # Deposits, loans and your cut per week ("W") or month ("M") for a slice of client history
+    # (store.client_history(), already in time order, so the groups come out in order too)
+    amount = pd.to_numeric(history["Amount"], errors="coerce").fillna(0.0)
+    sums = pd.DataFrame({
+        "Deposits": amount.where(history["Type"] == "Deposit", 0.0),
+        "Loans": amount.where(history["Type"] == "Withdrawal", 0.0).abs(),
+        "Earnings": pd.to_numeric(history["Niece_Earnings"], errors="coerce").fillna(0.0),
+    }).groupby(pd.to_datetime(history["Date"]).dt.to_period(period).rename("Period"), sort=False).sum()
+    sums.index = sums.index.astype(str)
+    return sums
+
+
+# --- BUDGET & GOALS ---
+def budget_entry(category, item, amount, sass, now=None):
+    signed = -abs(amount) if category in OUTFLOW_CATEGORIES else amount
+    return {"Date": _stamp(now), "Category": category, "Item": item, "Amount": signed, "Sass_Level": sass}
+
+def signed_amounts(budget_df):
+    amounts = pd.to_numeric(budget_df["Amount"], errors="coerce").fillna(0.0)
+    return amounts.where(~budget_df["Category"].isin(OUTFLOW_CATEGORIES), -amounts.abs())
+
+def category_total(budget_df, category):
+    return float(pd.to_numeric(budget_df.loc[budget_df["Category"] == category, "Amount"], errors="coerce").abs().sum())
+
+def available_cash(total_earned, budget_df, goals_total=0.0):
+    # Shopping money: everything you've earned, plus/minus the Burn Book, minus what's locked in goals
+    return float(total_earned + signed_amounts(budget_df).sum() - goals_total)
+
+def save_to_goal(goal, amount, available):
+    if amount > available:
+        raise InsufficientFunds("You have no money. Boo.")
+    return GoalTransfer(goal, amount, "Savings Transfer", f"Saved to {goal}")
+
+def withdraw_from_goal(goal, amount, goal_balance):
+    if amount > goal_balance:
+        raise InsufficientFunds("You don't have that much saved!")
+    return GoalTransfer(goal, -amount, "Early Withdrawal", f"Took from {goal}")
+
+
+# --- STORE BINDINGS ---
+def post(store, postings, now=None):
+    # One Posting -> the committed row; a list -> one commit for the lot, returned as a frame
+    totals = get_totals(store)
+    if isinstance(postings, Posting):
+        return totals.apply({"ledger": postings.earnings},
+                            lambda: store.post_client_transaction(postings.to_row(now), postings.savings_change))
+    now = now or datetime.now()
+    frame = pd.DataFrame([p.to_row(now) for p in postings], columns=CLIENT_COLUMNS)
+    return totals.apply({"ledger": sum(p.earnings for p in postings)},
+                        lambda: store.post_client_transactions(frame, [p.savings_change for p in postings]))
+
+def record_budget(store, category, item, amount, sass, now=None):
+    entry = budget_entry(category, item, amount, sass, now)
+    get_totals(store).apply({"budget": entry["Amount"]}, lambda: store.append("budget", entry))
+
+def adjust_goal(store, goal, change):
+    get_totals(store).apply({"goals": change}, lambda: store.update_goal(goal, change))
+
+def apply_goal_transfer(store, transfer, sass, now=None):
+    # The goal balance and its Burn Book line go in as one transaction: both or neither
+    entry = budget_entry(transfer.category, transfer.item, 0, sass, now)
+    get_totals(store).apply({"goals": transfer.change, "budget": entry["Amount"]},
+                            lambda: store.transfer_goal(transfer.goal, transfer.change, entry))
+
+def replace_table(store, table, df):
+    # Whole-table rewrites (goal edits): that running total gets recomputed
+    get_totals(store).apply({table: None}, lambda: store.replace(table, df))
+
+def editor_changes(window, state):
+    # st.data_editor's change state -> (before, after, inserted) for store.apply_edits. The editor
+    # numbers rows by position in the frame it was given; window.index maps those back to table rows.
+    edited = {int(pos): cols for pos, cols in state.get("edited_rows", {}).items()}
+    deleted = [int(pos) for pos in state.get("deleted_rows", [])]
+    before = window.iloc[sorted(set(edited) | set(deleted))]
+    after = before.drop(index=window.index[deleted]).astype(object)
+    for pos, cols in edited.items():
+        if pos not in deleted:
+            for col, value in cols.items():
+                after.at[window.index[pos], col] = value
+    inserted = pd.DataFrame(state.get("added_rows", []), columns=window.columns)
+    if not inserted.empty and "Date" in inserted.columns:
+        inserted["Date"] = inserted["Date"].fillna(_stamp())
+    return before, after, inserted
+
+def apply_edits(store, table, before, after, inserted):
+    # Only the changed rows go to storage; the Burn Book's running total moves by exactly their difference
+    if before.empty and inserted.empty:
+        return 0
+    delta = None
+    if table == "budget":
+        delta = float(signed_amounts(after).sum() + signed_amounts(inserted).sum() - signed_amounts(before).sum())
+    get_totals(store).apply({table: delta}, lambda: store.apply_edits(table, before, after, inserted))
+    return len(before) + len(inserted)
+
+def balance(store, client):
+    return store.client_summary(client)["balance"]
+
+def revenue(store):
+    return get_totals(store).revenue()
+
+def shopping_money(store):
+    # available_cash() for the whole store, but O(1): served from the running totals
+    return get_totals(store).available_cash()
+
+def reconcile(store):
+    # Recount every running total from the tables; {part: (running, recomputed, drift)}
+    return get_totals(store).reconcile()
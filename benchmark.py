@@ -0,0 +1,204 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# --- HOT PATH BENCHMARKS ---
+# Builds synthetic ledgers/budgets of a given size in a scratch folder, imports bank_app headless
+# (bare mode, no browser) and times the functions every rerun leans on. Results go to JSON so two
+# runs can be compared.
+#   python benchmark.py                         -> 1k, 100k, 1M and 10M rows
+#   python benchmark.py --sizes 1k,100k --out before.json
+#   python benchmark.py --sizes 1k,100k --compare before.json
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = "1k,100k,1m,10m"
+REGRESSION_RATIO = 1.25
+REGRESSION_FLOOR_MS = 0.5  # sub-millisecond jitter isn't a regression
+
+
+# --- SYNTHETIC DATA ---
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+def generate_ledger(rows, clients=200, days=3 * 365, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Plastic {i:05d}" for i in range(clients)])
+    start = pd.Timestamp("2023-01-01")
+    minutes = np.sort(rng.integers(0, days * 24 * 60, rows))
+    client = names[rng.integers(0, clients, rows)]
+    client[:clients] = names[:min(clients, rows)]  # everyone gets an "Open" row up front
+    kind = rng.choice(["Deposit", "Withdrawal", "Penalty", "Waived"], rows, p=[0.75, 0.1, 0.1, 0.05])
+    kind[:clients] = "Open"
+    amount = np.where(kind == "Penalty", rng.integers(1, 8, rows) * 5.0, rng.integers(1, 200, rows).astype(float))
+    amount[kind == "Open"] = 0.0
+    amount[kind == "Waived"] = 0.0
+    earnings = np.where(kind == "Deposit", np.round(amount * 0.15, 2), np.where(kind == "Penalty", amount, 0.0))
+    change = np.select([kind == "Deposit", kind == "Withdrawal"], [amount - earnings, -amount], 0.0)
+    df = pd.DataFrame({
+        "Date": (start + pd.to_timedelta(minutes, unit="min")).strftime("%Y-%m-%d %H:%M"),
+        "Client": client, "Type": kind, "Amount": amount,
+        "Note": np.where(kind == "Open", "Joined the Clique", "Synthetic"),
+        "Savings_Balance": 0.0, "Niece_Earnings": earnings,
+        "Target": np.where(kind == "Open", 500.0, 0.0),
+        "Frequency": np.where(kind == "Open", "Weekly", ""),
+    })
+    df["Savings_Balance"] = pd.Series(change).groupby(df["Client"]).cumsum().round(2)
+    return df
+
+def generate_budget(rows, days=3 * 365, seed=1):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2023-01-01")
+    minutes = np.sort(rng.integers(0, days * 24 * 60, rows))
+    category = rng.choice(["Income", "Spending", "Savings Transfer", "Early Withdrawal"], rows, p=[0.4, 0.4, 0.15, 0.05])
+    amount = rng.integers(1, 60, rows).astype(float)
+    amount = np.where(category == "Spending", -amount, np.where(category == "Income", amount, 0.0))
+    return pd.DataFrame({
+        "Date": (start + pd.to_timedelta(minutes, unit="min")).strftime("%Y-%m-%d %H:%M"),
+        "Category": category, "Item": "Synthetic", "Amount": amount, "Sass_Level": "That is so fetch.",
+    })
+
+
+# --- HARNESS ---
+def load_app_headless():
+    sys.path.insert(0, REPO_DIR)
+    from streamlit import config, logger
+    config.get_config_options()  # parse config first, or it resets the level we set below
+    logger.set_log_level("error")
+    import bank_app  # bare mode: the UI part just no-ops
+    return bank_app
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"repeats": repeats, "min_ms": min(samples), "median_ms": statistics.median(samples), "max_ms": max(samples)}
+
+def bench_size(rows, clients, days, repeats, backend):
+    work = tempfile.mkdtemp(prefix=f"bank_bench_{rows}_")
+    os.chdir(work)
+    for asset in ["facts.csv", "quotes.csv", "pig_map.csv", "gifs"] + glob.glob("pig_*.png", root_dir=REPO_DIR):
+        if os.path.exists(os.path.join(REPO_DIR, asset)):
+            os.symlink(os.path.join(REPO_DIR, asset), asset)
+
+    started = time.perf_counter()
+    generate_ledger(rows, clients, days).to_csv("ledger.csv", index=False)
+    generate_budget(max(rows // 10, 10), days).to_csv("my_budget.csv", index=False)
+    results = {"generate_s": time.perf_counter() - started, "ledger_bytes": os.path.getsize("ledger.csv")}
+
+    app = load_app_headless()
+    from storage import LOADER_CACHE, CsvStore, SqliteStore
+    if backend == "parquet":
+        from parquet_store import ParquetStore
+    LOADER_CACHE.invalidate()
+    # A fresh store per size: the shared one from get_store() is bound to the first scratch folder
+    started = time.perf_counter()
+    store = app.STORE = {"sqlite": SqliteStore, "csv": CsvStore}.get(backend, lambda: ParquetStore())()
+    results["open_store_s"] = time.perf_counter() - started
+    client = "Plastic 00000"
+
+    def cold_load():
+        LOADER_CACHE.invalidate()
+        app.load_client_data()
+
+    def index_rebuild():
+        index = store.ledger_index()
+        index.signature = ("stale",)
+        index.refresh()
+
+    def table_dashboard():
+        stats = store.client_summary(client)
+        store.revenue()
+        store.client_history(client)
+        return stats
+
+    def empire_metrics():
+        return app.engine.shopping_money(store)  # running totals; a recount is its own case below
+
+    cases = [
+        ("load_client_data (cold)", cold_load, max(1, repeats // 5)),
+        ("load_client_data (warm)", app.load_client_data, repeats),
+        ("save_client_transaction", lambda: app.save_client_transaction(client, "Deposit", 10.0, "bench", 8.5, 1.5), repeats),
+        ("save_personal_transaction", lambda: app.save_personal_transaction("Income", "bench", 5.0, "bench"), repeats),
+        ("update_goal", lambda: app.update_goal("College", 1.0), repeats),
+        ("get_daily_content", lambda: app.get_daily_content(app.QUOTES_FILE, "DailyMotoQuote", "fallback"), repeats * 10),
+        ("get_pig_image", lambda: app.get_pig_image(42.0), repeats * 10),
+        ("dashboard: The Table", table_dashboard, repeats),
+        ("dashboard: World Domination metrics", empire_metrics, repeats),
+        ("totals reconcile", lambda: app.engine.reconcile(store), max(1, repeats // 5)),
+    ]
+    if store.name == "csv":  # the other backends answer these from indexes / the manifest
+        cases.insert(2, ("ledger index rebuild", index_rebuild, max(1, repeats // 5)))
+    for name, fn, n in cases:
+        results[name] = timed(fn, n)
+    os.chdir(REPO_DIR)
+    shutil.rmtree(work, ignore_errors=True)  # the 10M ledger alone is most of a gigabyte
+    return results
+
+
+# --- REPORTING ---
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for size, ops in current["results"].items():
+        for op, stats in ops.items():
+            old = baseline.get("results", {}).get(size, {}).get(op)
+            if not isinstance(stats, dict) or not isinstance(old, dict):
+                continue
+            ratio = stats["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+            slower = stats["median_ms"] - old["median_ms"] > REGRESSION_FLOOR_MS
+            flag = "  <-- REGRESSION" if ratio > REGRESSION_RATIO and slower else ""
+            print(f"{size:>10} {op:<38} {old['median_ms']:10.3f} -> {stats['median_ms']:10.3f} ms  x{ratio:5.2f}{flag}")
+            if flag:
+                regressions.append((size, op, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time bank_app hot paths against synthetic data")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts, e.g. 1k,100k,1m,10m")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--days", type=int, default=3 * 365, help="date span of the synthetic history")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--backend", choices=["csv", "sqlite", "parquet"], default="csv")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    os.environ["BANK_STORAGE"] = args.backend
+    report = {
+        "meta": {
+            "when": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "pandas": pd.__version__, "platform": platform.platform(), "backend": args.backend,
+            "clients": args.clients, "days": args.days, "repeats": args.repeats,
+        },
+        "results": {},
+    }
+    for size in args.sizes.split(","):
+        rows = parse_size(size)
+        print(f"--- {rows:,} rows ---")
+        report["results"][str(rows)] = bench_size(rows, args.clients, args.days, args.repeats, args.backend)
+        for op, stats in report["results"][str(rows)].items():
+            if isinstance(stats, dict):
+                print(f"  {op:<38} median {stats['median_ms']:10.3f} ms")
+
+    with open(os.path.join(REPO_DIR, args.out) if not os.path.isabs(args.out) else args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare) else 0)
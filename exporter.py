@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+from safe_io import dates_as_text
+from storage import CHUNK_ROWS, TABLES, get_store
+
+# --- STREAMING EXPORT ---
+# Statements (one client's rows, just the columns she cares about) and full extracts (every column
+# of the ledger or the Burn Book) as CSV or JSON Lines. It's all one generator of byte chunks over
+# the store's iter_chunks(): memory is a chunk no matter how big the ledger gets, and the header is
+# out before the first read. Used by the CLI below, GET /export in bank_api.py and The Table.
+#   python exporter.py ledger_extract.csv                                   -> whole ledger
+#   python exporter.py regina.csv --client Regina --statement --start 2025-01-01 --end 2025-06-30
+#   python exporter.py - --table budget --format jsonl                      -> to stdout
+# Dates: start and end are both included (whole days).
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+STATEMENT_COLUMNS = ["Date", "Type", "Amount", "Note", "Savings_Balance"]
+
+
+def export_columns(table="ledger", statement=False):
+    return STATEMENT_COLUMNS if statement else TABLES[table]["columns"]
+
+def encode_chunk(df, fmt):
+    df = dates_as_text(df)
+    if fmt == "csv":
+        return df.to_csv(header=False, index=False).encode("utf-8")
+    return df.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+
+def stream_export(store, table="ledger", client=None, start=None, end=None, fmt="csv", statement=False,
+                  chunk_rows=CHUNK_ROWS):
+    # Returns a generator of bytes. start / end are dates and both count; a statement needs a client.
+    # Bad arguments raise ValueError here, before anything is read or sent
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (pick {', '.join(FORMATS)})")
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if client is not None and "Client" not in TABLES[table]["columns"]:
+        raise ValueError(f"{table} has no Client column; leave the client off")
+    if statement and (table != "ledger" or client is None):
+        raise ValueError("A statement is one client's ledger rows; give a client")
+    end = None if end is None else end + timedelta(days=1)
+    return _stream(store, table, client, start, end, fmt, export_columns(table, statement), chunk_rows)
+
+def _stream(store, table, client, start, end, fmt, columns, chunk_rows):
+    if fmt == "csv":
+        yield (",".join(columns) + "\n").encode("utf-8")
+    for chunk in store.iter_chunks(table, client, start, end, chunk_rows):
+        if len(chunk):
+            yield encode_chunk(chunk[columns], fmt)
+
+def export_name(table="ledger", client=None, start=None, end=None, fmt="csv", statement=False):
+    # ledger_extract.csv, Regina_statement_2025-01-01_2025-06-30.jsonl, ...
+    parts = [client] if client else []
+    parts.append("statement" if statement else f"{TABLES[table]['file'].rsplit('.', 1)[0]}_extract")
+    if start or end:
+        parts += [str(start or "beginning"), str(end or "now")]
+    return "_".join(p.replace(" ", "_") for p in parts) + f".{fmt}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a statement or extract out of the store as CSV / JSON Lines")
+    parser.add_argument("output", nargs="?", default=None, help="file to write ('-' for stdout; default: a name from the filters)")
+    parser.add_argument("--table", choices=[t for t in TABLES if t != "goals"], default="ledger")
+    parser.add_argument("--client", default=None, help="just this client's rows")
+    parser.add_argument("--statement", action="store_true", help="client statement columns only (needs --client)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="last day, included (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=list(FORMATS), default=None, help="default: from the file name, else csv")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if (args.output or "").endswith((".jsonl", ".ndjson")) else "csv")
+    output = args.output or export_name(args.table, args.client, args.start, args.end, fmt, args.statement)
+    try:
+        chunks = stream_export(get_store(), args.table, args.client, args.start, args.end, fmt, args.statement)
+        if output == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            sys.exit(0)
+        written = 0
+        tmp_path = output + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, output)  # never leave half an export under the real name
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Wrote {output} ({written:,} bytes)")
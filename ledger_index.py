@@ -0,0 +1,194 @@
+import bisect
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import perf
+
+# --- PER-CLIENT LEDGER INDEX ---
+# Keeps the last balance, target, frequency, row offsets and lifetime earnings for every
+# client so the app never has to filter the whole ledger to answer "what's her balance?".
+# Each client's rows are kept sorted by Date next to their timestamps, so "this date range" or
+# "the last 25" is two binary searches (see window()).
+# Lives in its own module so it survives Streamlit reruns (the script re-executes, imports don't).
+
+
+def file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _new_entry():
+    return {"balance": 0.0, "target": 0.0, "frequency": "", "rows": [], "times": [], "earnings": 0.0}
+
+def _ns(values):
+    # Dates -> int64 nanoseconds; unreadable ones sort first (NaT is the smallest int64)
+    return pd.to_datetime(pd.Series(values), format="ISO8601", errors="coerce").to_numpy("datetime64[ns]").view("int64")
+
+def _add_rows(entry, rows, times):
+    # Appends are nearly always in time order; only a back-dated row pays for a re-sort
+    # (ties keep file order)
+    in_order = all(a <= b for a, b in zip(times, times[1:]))
+    if in_order and (not entry["times"] or not times or times[0] >= entry["times"][-1]):
+        entry["rows"].extend(rows)
+        entry["times"].extend(times)
+        return
+    pairs = sorted(zip(entry["times"] + times, entry["rows"] + rows))
+    entry["times"] = [t for t, _ in pairs]
+    entry["rows"] = [r for _, r in pairs]
+
+
+class LedgerIndex:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.clients = {}
+        self.total_earnings = 0.0
+        self.row_count = 0
+        self.signature = None
+        self.rebuilds = 0
+        self.lock = threading.RLock()
+
+    # --- REBUILD (only when someone else touched the file) ---
+    def refresh(self):
+        with self.lock:
+            signature = file_signature(self.file_path)
+            if signature != self.signature:
+                self._rebuild(signature)
+        return self
+
+    def _rebuild(self, signature):
+        self.clients = {}
+        self.total_earnings = 0.0
+        self.row_count = 0
+        self.signature = signature
+        self.rebuilds += 1
+        if signature is None:
+            return
+        wanted = ("Date", "Client", "Savings_Balance", "Niece_Earnings", "Target", "Frequency")
+        df = pd.read_csv(self.file_path, usecols=lambda c: c in wanted,
+                         dtype={"Date": "str", "Client": "str", "Frequency": "str", "Savings_Balance": "float64",
+                                "Niece_Earnings": "float64", "Target": "float64"})
+        perf.count(rows=len(df), bytes_read=signature[0])
+        self.row_count = len(df)
+        if df.empty:
+            return
+        for col in ("Target", "Niece_Earnings", "Savings_Balance"):
+            if col not in df.columns:
+                df[col] = 0.0
+        if "Frequency" not in df.columns:
+            df["Frequency"] = ""
+        df["Frequency"] = df["Frequency"].fillna("").astype(str)
+
+        times = _ns(df["Date"]) if "Date" in df.columns else np.full(len(df), np.iinfo("int64").min)
+        grouped = df.groupby("Client", sort=False)
+        # Plain dicts: per-client Series lookups are the slow part with thousands of clients
+        balances = grouped["Savings_Balance"].last().to_dict()
+        earnings = grouped["Niece_Earnings"].sum().to_dict()
+        targets = grouped["Target"].max().fillna(0.0).to_dict()
+        freqs = df[df["Frequency"] != ""].groupby("Client", sort=False)["Frequency"].last().to_dict()
+        for client, rows in grouped.indices.items():
+            entry = _new_entry()
+            entry["balance"] = float(balances[client])
+            entry["earnings"] = float(earnings[client])
+            entry["target"] = float(targets[client])
+            entry["frequency"] = freqs.get(client, "")
+            _add_rows(entry, rows.tolist(), times[rows].tolist())
+            self.clients[client] = entry
+        # Keep first-appearance order, same as df["Client"].unique()
+        order = df["Client"].drop_duplicates().tolist()
+        self.clients = {c: self.clients[c] for c in order}
+        self.total_earnings = float(df["Niece_Earnings"].sum())
+
+    # --- INCREMENTAL UPDATE (after our own append) ---
+    def record(self, row):
+        with self.lock:
+            earnings = 0.0 if pd.isna(row.get("Niece_Earnings")) else float(row["Niece_Earnings"])
+            target = 0.0 if pd.isna(row.get("Target")) else float(row["Target"])
+            entry = self.clients.setdefault(row["Client"], _new_entry())
+            entry["balance"] = float(row["Savings_Balance"])
+            entry["earnings"] += earnings
+            entry["target"] = max(entry["target"], target)
+            if isinstance(row.get("Frequency"), str) and row["Frequency"]:
+                entry["frequency"] = row["Frequency"]
+            _add_rows(entry, [self.row_count], _ns([row.get("Date")]).tolist())
+            self.row_count += 1
+            self.total_earnings += earnings
+            self.signature = file_signature(self.file_path)
+
+    def record_many(self, df):
+        # Same as record() for a whole frame of appended rows (group commits, bulk imports)
+        if len(df) < 64:
+            for row in df.to_dict("records"):
+                self.record(row)
+            return
+        with self.lock:
+            earnings = df["Niece_Earnings"].astype(float).fillna(0.0)
+            targets = df["Target"].astype(float).fillna(0.0)
+            freqs = df["Frequency"].fillna("").astype(str)
+            grouped = pd.DataFrame({
+                "Client": df["Client"].to_numpy(), "Balance": df["Savings_Balance"].astype(float).to_numpy(),
+                "Earnings": earnings.to_numpy(), "Target": targets.to_numpy(),
+                "Frequency": freqs.where(freqs != "").to_numpy(),  # NaN so "last" skips the blanks
+            }).groupby("Client", sort=False)
+            summary = grouped.agg(Balance=("Balance", "last"), Earnings=("Earnings", "sum"),
+                                  Target=("Target", "max"), Frequency=("Frequency", "last"))
+            indices = grouped.indices
+            times = _ns(df["Date"].to_numpy())
+            # Plain tuples, not .at lookups: a scheduler run can touch thousands of clients at once
+            for client, balance, earned, target, freq in summary.itertuples(name=None):
+                entry = self.clients.setdefault(client, _new_entry())
+                entry["balance"] = float(balance)
+                entry["earnings"] += float(earned)
+                entry["target"] = max(entry["target"], float(target))
+                if isinstance(freq, str):
+                    entry["frequency"] = freq
+                _add_rows(entry, (indices[client] + self.row_count).tolist(), times[indices[client]].tolist())
+            self.row_count += len(df)
+            self.total_earnings += float(earnings.sum())
+            self.signature = file_signature(self.file_path)
+
+    # --- LOOKUPS ---
+    def client_names(self):
+        return list(self.refresh().clients)
+
+    def get(self, client_name):
+        return self.refresh().clients.get(client_name, _new_entry())
+
+    def summary(self, client_name):
+        # A copy with just the numbers (SqliteStore.client_summary's shape); rows / times stay in here
+        entry = self.get(client_name)
+        return {key: entry[key] for key in ("balance", "target", "frequency", "earnings")}
+
+    def balance(self, client_name):
+        return self.get(client_name)["balance"]
+
+    def revenue(self):
+        return self.refresh().total_earnings
+
+    def window(self, client_name, start=None, end=None, last=None):
+        # Her row positions with start <= Date < end, oldest first; `last` keeps just the newest N
+        entry = self.get(client_name)
+        with self.lock:
+            times = entry["times"]
+            lo = 0 if start is None else bisect.bisect_left(times, int(_ns([start])[0]))
+            hi = len(times) if end is None else bisect.bisect_left(times, int(_ns([end])[0]))
+            if last is not None:
+                lo = max(lo, hi - last)
+            return entry["rows"][lo:hi]
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_ledger_index(file_path):
+    with _INDEXES_LOCK:
+        key = os.path.abspath(file_path)
+        if key not in _INDEXES:
+            _INDEXES[key] = LedgerIndex(file_path)
+        return _INDEXES[key]
@@ -0,0 +1,492 @@
+import glob
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import perf
+from ledger_index import file_signature
+from safe_io import file_lock, fsync_dir, record_commit
+from storage import CHUNK_ROWS, CLIENT_COLUMNS, CLIENT_FILE, LOADER_CACHE, CsvStore, _window, read_csv_table
+
+# --- COLUMNAR LEDGER (BANK_STORAGE=parquet) ---
+# The ledger lives in ledger_parquet/month=YYYY-MM/ as Parquet files with a real timestamp Date and
+# dictionary-encoded (categorical) Client/Type/Note/Frequency. Each commit drops a small seg-<seq>
+# file into the month(s) it touches; compaction folds a month's segments into one base-<seq> file.
+# _manifest.json is the commit point. It only holds counters, so a commit rewrites a few hundred
+# bytes however many clients there are. The per-client summary (balance, target, months) is a
+# snapshot, _clients-<gen>.json, plus a log of the entries each commit changed, _clients-<gen>.log.
+# The manifest records how many bytes of that log are committed. Readers replay just the bytes they
+# haven't seen yet, and compaction folds the log into a fresh snapshot. So balances, revenue and
+# "which months does she have rows in" never touch the data files.
+# Budget and goals stay CSV; they're tiny.
+#   python parquet_store.py migrate   -> ledger.csv into ledger_parquet/
+#   python parquet_store.py compact   -> merge every month's segments
+#   python parquet_store.py export    -> ledger_parquet/ back out to ledger.csv
+
+PARQUET_DIR = "ledger_parquet"
+MANIFEST_FILE = "_manifest.json"
+COMPACT_AT_SEGMENTS = 16     # a month gets compacted inline once it has this many segments
+SUMMARY_ROLL_BYTES = 1 << 20 # the client log is folded into a new snapshot past this (or the snapshot's size)
+NO_DATE_MONTH = "0000-00"    # rows whose Date won't parse
+
+CATEGORY_COLUMNS = ["Client", "Type", "Note", "Frequency"]
+FLOAT_COLUMNS = ["Amount", "Savings_Balance", "Niece_Earnings", "Target"]
+ROW_ID = "Row_ID"            # global append order; month partitions alone would lose it
+LEDGER_SCHEMA = pa.schema(
+    [(c, pa.timestamp("ms") if c == "Date" else pa.float64() if c in FLOAT_COLUMNS else pa.dictionary(pa.int32(), pa.string()))
+     for c in CLIENT_COLUMNS]
+    + [(ROW_ID, pa.int64())]
+)
+
+
+def _new_manifest():
+    return {"version": 2, "next_seq": 1, "next_row": 0, "total_earnings": 0.0, "summary": {"gen": None, "bytes": 0}}
+
+def _new_gen():
+    return f"{time.time_ns():x}"  # never reused, even across replace()
+
+def _write_json(data, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+def _seq(path):
+    return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+def _typed(frame):
+    # Incoming rows (strings from the UI, CSV frames) -> the dtypes we store
+    df = frame.reindex(columns=CLIENT_COLUMNS).copy()
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce", format="mixed")
+    for col in FLOAT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].fillna("").astype(str)
+    return df
+
+def _months(df):
+    return df["Date"].dt.strftime("%Y-%m").fillna(NO_DATE_MONTH)
+
+
+class ParquetStore(CsvStore):
+    name = "parquet"
+    csv_tables = ("budget", "goals")  # ledger.csv is only read by migrate_from_csv
+
+    def __init__(self, root=".", csv_root=None):
+        super().__init__(root)
+        self.dir = os.path.join(root, PARQUET_DIR)
+        self.csv_root = root if csv_root is None else csv_root
+        self._manifest_cache = (None, None)
+        self._summary_cache = (None, 0, {})  # (gen, log bytes applied, {client: entry})
+        self._summary_lock = threading.RLock()
+        self.compactions = 0
+        with self.lock, file_lock(self.dir):
+            self._recover()
+            self._upgrade_manifest()
+        self.migrate_from_csv()
+
+    # --- MANIFEST ---
+    def _manifest_path(self):
+        return os.path.join(self.dir, MANIFEST_FILE)
+
+    def _manifest(self):
+        # Re-read only when another process has committed since we last looked
+        signature = file_signature(self._manifest_path())
+        if signature is None:
+            return _new_manifest()
+        if self._manifest_cache[0] != signature:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                self._manifest_cache = (signature, json.load(f))
+        return self._manifest_cache[1]
+
+    def _save_manifest(self, manifest, directory=None):
+        path = os.path.join(directory or self.dir, MANIFEST_FILE)
+        _write_json(manifest, path)
+        if directory is None:
+            self._manifest_cache = (file_signature(path), manifest)
+
+    def _upgrade_manifest(self):
+        # Caller holds file_lock(self.dir). v1 kept the client summaries inside the manifest
+        manifest = self._manifest()
+        if not os.path.exists(self._manifest_path()) or "summary" in manifest:
+            return
+        gen = _new_gen()
+        _write_json(manifest["clients"], self._summary_paths(gen)[0])
+        self._save_manifest(dict({k: v for k, v in manifest.items() if k != "clients"}, version=2,
+                                 summary={"gen": gen, "bytes": 0}))
+
+    # --- CLIENT SUMMARIES ---
+    def _summary_paths(self, gen, directory=None):
+        base = os.path.join(directory or self.dir, f"_clients-{gen}")
+        return base + ".json", base + ".log"
+
+    def _clients(self):
+        # {client: entry} as of the last commit. Entries are replaced, never edited, so a caller may
+        # keep one; iterate the dict under self._summary_lock
+        with self._summary_lock:
+            for attempt in range(2):
+                summary = self._manifest()["summary"]
+                gen, offset, clients = self._summary_cache
+                try:
+                    if gen != summary["gen"] or offset > summary["bytes"]:
+                        gen, offset, clients = summary["gen"], 0, {}
+                        if gen is not None:
+                            with open(self._summary_paths(gen)[0], encoding="utf-8") as f:
+                                clients = json.load(f)
+                    if offset < summary["bytes"]:
+                        with open(self._summary_paths(gen)[1], "rb") as f:
+                            f.seek(offset)
+                            for line in f.read(summary["bytes"] - offset).decode("utf-8").splitlines():
+                                entry = json.loads(line)
+                                clients[entry.pop("client")] = entry
+                        offset = summary["bytes"]
+                    break
+                except FileNotFoundError:  # a compaction rolled the snapshot under us; look again
+                    if attempt:
+                        raise
+            self._summary_cache = (gen, offset, clients)
+            return clients
+
+    def _client(self, client_name):
+        return self._clients().get(client_name, {})
+
+    def _log_summaries(self, manifest, entries):
+        # Caller holds the lock. Appends the changed entries; returns the log's committed length
+        gen, size = manifest["summary"]["gen"], manifest["summary"]["bytes"]
+        if not entries:
+            return size
+        data = "".join(json.dumps(dict(entry, client=client)) + "\n" for client, entry in entries.items()).encode("utf-8")
+        with open(self._summary_paths(gen)[1], "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        perf.count(bytes_written=len(data))
+        return size + len(data)
+
+    def _roll_summary(self, manifest):
+        # Caller holds the lock. Everything committed so far into a new snapshot, with an empty log
+        os.makedirs(self.dir, exist_ok=True)
+        gen = _new_gen()
+        with self._summary_lock:
+            _write_json(self._clients(), self._summary_paths(gen)[0])
+        manifest = dict(manifest, summary={"gen": gen, "bytes": 0})
+        self._save_manifest(manifest)
+        self._drop_old_summaries(gen)
+        return manifest
+
+    def _drop_old_summaries(self, gen):
+        keep = set(self._summary_paths(gen))
+        for path in glob.glob(os.path.join(self.dir, "_clients-*")):
+            if path not in keep:
+                os.remove(path)
+
+    def _recover(self):
+        # Caller holds file_lock(self.dir). Undo a half-finished replace(), then drop segments that
+        # were written but never made it into the manifest (their commit was never acknowledged).
+        if not os.path.exists(self.dir) and os.path.exists(self.dir + ".old"):
+            os.replace(self.dir + ".old", self.dir)
+        shutil.rmtree(self.dir + ".old", ignore_errors=True)
+        shutil.rmtree(self.dir + ".new", ignore_errors=True)
+        if not os.path.exists(self._manifest_path()):
+            return
+        manifest = self._manifest()
+        for path in glob.glob(os.path.join(self.dir, "month=*", "seg-*.parquet")):
+            if _seq(path) >= manifest["next_seq"]:
+                os.remove(path)
+        # Same for client log lines past the committed length, and snapshots from a roll that didn't finish
+        summary = manifest.get("summary")
+        if summary and summary["gen"] is not None:
+            log = self._summary_paths(summary["gen"])[1]
+            if os.path.exists(log) and os.path.getsize(log) > summary["bytes"]:
+                with open(log, "rb+") as f:
+                    f.truncate(summary["bytes"])
+            self._drop_old_summaries(summary["gen"])
+
+    # --- FILES ---
+    def _month_files(self, month, next_seq):
+        # The newest base plus the committed segments after it, oldest first
+        files = glob.glob(os.path.join(self.dir, f"month={month}", "*.parquet"))
+        bases = [p for p in files if os.path.basename(p).startswith("base-")]
+        floor = max((_seq(p) for p in bases), default=0)
+        segments = sorted((p for p in files if os.path.basename(p).startswith("seg-") and floor < _seq(p) < next_seq), key=_seq)
+        return ([max(bases, key=_seq)] if bases else []) + segments
+
+    def _write_file(self, df, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.astype({c: "category" for c in CATEGORY_COLUMNS}),
+                                     schema=LEDGER_SCHEMA, preserve_index=False)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path)
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_dir(path)
+        perf.count(rows=len(df), bytes_written=os.path.getsize(path))
+
+    def scan(self, columns=None, months=None, client=None):
+        # Partition pruning by month, column pruning by name, row filtering by client inside the files
+        manifest = self._manifest()
+        wanted = None if columns is None else list(dict.fromkeys(list(columns) + [ROW_ID]))
+        if months is None:
+            months = sorted(os.path.basename(p)[len("month="):] for p in glob.glob(os.path.join(self.dir, "month=*")))
+        filters = [("Client", "=", client)] if client is not None else None
+        for attempt in range(2):
+            try:
+                tables, size = [], 0
+                for month in months:
+                    for path in self._month_files(month, manifest["next_seq"]):
+                        tables.append(pq.read_table(path, columns=wanted, filters=filters))
+                        size += os.path.getsize(path)
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise
+                manifest = self._manifest()  # a compaction swapped files under us; list again
+        if not tables:
+            df = _typed(pd.DataFrame(columns=CLIENT_COLUMNS)).astype({c: "category" for c in CATEGORY_COLUMNS})
+            df[ROW_ID] = pd.Series(dtype="int64")
+            df = df[wanted] if wanted else df
+        else:
+            df = pa.concat_tables(tables).to_pandas()
+        perf.count(rows=len(df), bytes_read=size)
+        return df.sort_values(ROW_ID, kind="stable").drop(columns=ROW_ID).reset_index(drop=True)
+
+    # --- READS ---
+    def exists(self, table):
+        if table == "ledger":
+            return os.path.exists(self._manifest_path())
+        return super().exists(table)
+
+    def version(self, table):
+        if table == "ledger":
+            return file_signature(self._manifest_path())  # the manifest is the commit point
+        return super().version(table)
+
+    def load(self, table):
+        if table != "ledger":
+            return super().load(table)
+        return LOADER_CACHE.get(self.dir, file_signature(self._manifest_path()), self.scan)
+
+    def client_names(self):
+        with self._summary_lock:
+            return list(self._clients())
+
+    def client_summary(self, client_name):
+        entry = self._client(client_name)
+        return {"balance": entry.get("balance", 0.0), "target": entry.get("target", 0.0),
+                "frequency": entry.get("frequency", ""), "earnings": entry.get("earnings", 0.0)}
+
+    def client_history(self, client_name, start=None, end=None, last=None):
+        # Only the months she has rows in that overlap start..end; for last=N, her months newest
+        # first until there are N rows
+        months = self._months_between(self._client(client_name).get("months", []), start, end)
+        in_range = lambda df: _window(df, start=start, end=end)
+        if last is None:
+            df = in_range(self.scan(months=months, client=client_name))
+        else:
+            parts, found = [], 0
+            for month in reversed(months):
+                parts.insert(0, in_range(self.scan(months=[month], client=client_name)))
+                found += len(parts[0])
+                if found >= last:
+                    break
+            df = pd.concat(parts, ignore_index=True) if parts else in_range(self.scan(months=[], client=client_name))
+        df = df.sort_values("Date", kind="stable").reset_index(drop=True)
+        return df if last is None else df.tail(last).reset_index(drop=True)
+
+    def _months_between(self, months, start=None, end=None):
+        months = sorted(months)
+        if start is not None:
+            months = [m for m in months if m >= f"{pd.Timestamp(start):%Y-%m}"]
+        if end is not None:
+            months = [m for m in months if m <= f"{pd.Timestamp(end):%Y-%m}"]
+        return months
+
+    def iter_chunks(self, table, client=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+        # A month partition at a time (only the months that can match), so memory is one month
+        # however long the ledger gets. Months come out in order, rows in append order within each.
+        if table != "ledger":
+            yield from super().iter_chunks(table, client, start, end, chunk_rows)
+            return
+        if client is not None:
+            months = self._client(client).get("months", [])
+        else:
+            months = [os.path.basename(p)[len("month="):] for p in glob.glob(os.path.join(self.dir, "month=*"))]
+        for month in self._months_between(months, start, end):
+            df = _window(self.scan(months=[month], client=client), start=start, end=end)
+            df = df.astype({c: str for c in CATEGORY_COLUMNS})
+            for first in range(0, len(df), chunk_rows):
+                yield df.iloc[first:first + chunk_rows].reset_index(drop=True)
+
+    def column_sum(self, column, client=None):
+        return float(self.scan(columns=[column, "Client"] if client else [column], client=client)[column].sum())
+
+    def revenue(self):
+        return self._manifest()["total_earnings"]
+
+    # --- WRITES ---
+    def post_client_transaction(self, row, savings_change):
+        committed = self.post_client_transactions(pd.DataFrame([row]), [savings_change])
+        row["Savings_Balance"] = float(committed["Savings_Balance"].iloc[0])
+        return row
+
+    def post_client_transactions(self, df, savings_changes):
+        df = _typed(df.reset_index(drop=True))
+        changes = pd.Series(savings_changes).reset_index(drop=True).astype(float)
+        with self.lock, file_lock(self.dir):
+            self._recover()
+            before = self.version("ledger")
+            manifest = dict(self._manifest())  # edit a copy; the file is the commit point
+            if manifest["summary"]["gen"] is None:
+                manifest = self._roll_summary(manifest)  # first commit into an empty store
+            base = {c: self._client(c).get("balance", 0.0) for c in df["Client"].unique()}
+            df["Savings_Balance"] = df["Client"].map(base) + changes.groupby(df["Client"]).cumsum()
+            df[ROW_ID] = np.arange(manifest["next_row"], manifest["next_row"] + len(df))
+            months = _months(df)
+            seq = manifest["next_seq"]
+            for month, part in df.groupby(months, sort=True):
+                self._write_file(part, os.path.join(self.dir, f"month={month}", f"seg-{seq:010d}.parquet"))
+            log_bytes = self._log_summaries(manifest, self._fold(self._clients(), df, months))
+            manifest.update(next_seq=seq + 1, next_row=manifest["next_row"] + len(df),
+                            total_earnings=manifest["total_earnings"] + float(df["Niece_Earnings"].fillna(0.0).sum()),
+                            summary=dict(manifest["summary"], bytes=log_bytes))
+            self._save_manifest(manifest)
+            LOADER_CACHE.invalidate(self.dir)
+            for month in months.unique():
+                if len(self._month_files(month, manifest["next_seq"])) > COMPACT_AT_SEGMENTS:
+                    self._compact_month(month, manifest)
+            snapshot = os.path.getsize(self._summary_paths(manifest["summary"]["gen"])[0])
+            if log_bytes > max(SUMMARY_ROLL_BYTES, snapshot):
+                self._roll_summary(manifest)  # doubling, so the snapshot rewrite is O(batch) per commit on average
+            record_commit("ledger", before, self.version("ledger"))
+        return df.drop(columns=ROW_ID)
+
+    def _fold(self, clients, df, months):
+        # A frame of committed rows folded into the summary -> {client: new entry} for just the
+        # clients it touches (clients itself isn't changed). Single clicks go row by row; a groupby
+        # only pays off for bulk commits (same trade-off as LedgerIndex.record_many).
+        if len(df) < 64:
+            stats = {}
+            for row, month in zip(df[["Client", "Savings_Balance", "Niece_Earnings", "Target", "Frequency"]].itertuples(index=False), months):
+                s = stats.setdefault(row.Client, {"Balance": 0.0, "Earnings": 0.0, "Target": 0.0, "Frequency": "", "Rows": 0, "Months": set()})
+                s["Balance"] = row.Savings_Balance
+                s["Earnings"] += np.nan_to_num(row.Niece_Earnings)
+                s["Target"] = max(s["Target"], np.nan_to_num(row.Target))
+                s["Frequency"] = row.Frequency or s["Frequency"]
+                s["Rows"] += 1
+                s["Months"].add(month)
+        else:
+            grouped = df.assign(Month=months).groupby("Client", sort=False)
+            summary = grouped.agg(Balance=("Savings_Balance", "last"), Earnings=("Niece_Earnings", "sum"),
+                                  Target=("Target", "max"), Rows=(ROW_ID, "size"))
+            summary["Earnings"] = summary["Earnings"].fillna(0.0)
+            summary["Target"] = summary["Target"].fillna(0.0)
+            summary["Frequency"] = df[df["Frequency"] != ""].groupby("Client", sort=False)["Frequency"].last()
+            summary["Frequency"] = summary["Frequency"].fillna("")
+            summary["Months"] = grouped["Month"].unique().map(set)
+            stats = summary.to_dict("index")
+        entries = {}
+        for client, s in stats.items():
+            old = clients.get(client, {"balance": 0.0, "target": 0.0, "frequency": "", "earnings": 0.0, "rows": 0, "months": []})
+            entries[client] = {
+                "balance": float(s["Balance"]),
+                "target": max(old["target"], float(s["Target"])),
+                "frequency": s["Frequency"] or old["frequency"],
+                "earnings": old["earnings"] + float(s["Earnings"]),
+                "rows": old["rows"] + int(s["Rows"]),
+                "months": sorted(set(old["months"]) | {str(m) for m in s["Months"]}),
+            }
+        return entries
+
+    def replace(self, table, df):
+        if table != "ledger":
+            return super().replace(table, df)
+        # Build the new layout next door, then swap whole directories
+        df = _typed(df.reset_index(drop=True))
+        df[ROW_ID] = np.arange(len(df))
+        months = _months(df)
+        gen = _new_gen()
+        manifest = dict(_new_manifest(), next_row=len(df), total_earnings=float(df["Niece_Earnings"].fillna(0.0).sum()),
+                        summary={"gen": gen, "bytes": 0})
+        staging = self.dir + ".new"
+        with self.lock, file_lock(self.dir):
+            before = self.version("ledger")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for month, part in df.groupby(months, sort=True):
+                self._write_file(part, os.path.join(staging, f"month={month}", "base-0000000000.parquet"))
+            _write_json(self._fold({}, df, months), self._summary_paths(gen, staging)[0])
+            self._save_manifest(manifest, staging)
+            if os.path.exists(self.dir):
+                os.replace(self.dir, self.dir + ".old")
+            os.replace(staging, self.dir)
+            shutil.rmtree(self.dir + ".old", ignore_errors=True)
+            fsync_dir(self.dir)
+            self._manifest_cache = (None, None)
+            LOADER_CACHE.invalidate(self.dir)
+            record_commit("ledger", before, self.version("ledger"))
+
+    # --- COMPACTION ---
+    def compact(self):
+        # Merge every month's segments into a single base file and the client log into its snapshot.
+        # Returns how many months were rewritten.
+        with self.lock, file_lock(self.dir):
+            self._recover()
+            manifest = self._manifest()
+            if manifest["summary"]["bytes"]:
+                self._roll_summary(manifest)
+            months = [os.path.basename(p)[len("month="):] for p in glob.glob(os.path.join(self.dir, "month=*"))]
+            return sum(self._compact_month(m, manifest) for m in sorted(months))
+
+    def _compact_month(self, month, manifest):
+        # Caller holds the lock. The new base covers every seq below next_seq, so readers that see it
+        # ignore the old files straight away; those get deleted afterwards.
+        files = self._month_files(month, manifest["next_seq"])
+        if len(files) < 2 and not any(os.path.basename(p).startswith("seg-") for p in files):
+            return 0
+        merged = pa.concat_tables([pq.read_table(p) for p in files]).to_pandas()
+        merged = merged.sort_values(ROW_ID, kind="stable")
+        top = manifest["next_seq"] - 1
+        self._write_file(merged, os.path.join(self.dir, f"month={month}", f"base-{top:010d}.parquet"))
+        for path in glob.glob(os.path.join(self.dir, f"month={month}", "*.parquet")):
+            if _seq(path) < top or (os.path.basename(path).startswith("seg-") and _seq(path) == top):
+                os.remove(path)
+        self.compactions += 1
+        return 1
+
+    # --- ONE-SHOT CSV MIGRATION ---
+    def migrate_from_csv(self):
+        with self.lock:
+            if self.exists("ledger"):
+                return False
+            if not os.path.exists(os.path.join(self.csv_root, CLIENT_FILE)):
+                return False
+            self.replace("ledger", read_csv_table(self.csv_root, "ledger"))
+            return True
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    store = ParquetStore()
+    if command == "migrate":
+        if not store.migrate_from_csv():
+            store.replace("ledger", read_csv_table(".", "ledger"))
+        print(f"Imported ledger.csv into {store.dir}/")
+    elif command == "compact":
+        print(f"Compacted {store.compact()} month(s)")
+    elif command == "export":
+        CsvStore().replace("ledger", store.load("ledger"))
+        print(f"Exported {store.dir}/ to ledger.csv")
+    else:
+        sys.exit(f"Unknown command: {command}")
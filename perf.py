@@ -0,0 +1,133 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# --- PER-RERUN PERF METRICS ---
+# Every rerun gets a list of spans (loaders, saves, tab sections...), each with wall time plus
+# whatever rows/bytes the storage layer reported while it was open. At the end of the rerun the
+# lot goes to the sidebar panel and one JSON line in a rolling log. A span is two perf_counter()
+# calls and a list append, so it stays on in production; BANK_PERF=0 turns it all into no-ops.
+
+PERF_ENABLED = os.environ.get("BANK_PERF", "1").strip().lower() not in ("0", "off", "false", "no")
+PERF_LOG = os.environ.get("BANK_PERF_LOG", "perf_log.jsonl")
+PERF_LOG_BYTES = 1024 * 1024   # roll over at 1MB...
+PERF_LOG_KEEP = 3              # ...keeping perf_log.jsonl.1 .. .3
+RECENT_RUNS = 50
+
+_local = threading.local()     # Streamlit runs each session's reruns on its own thread
+_log_lock = threading.Lock()
+recent_runs = collections.deque(maxlen=RECENT_RUNS)
+
+
+class Span:
+    __slots__ = ("name", "depth", "ms", "rows", "bytes_read", "bytes_written")
+
+    def __init__(self, name, depth):
+        self.name, self.depth, self.ms = name, depth, 0.0
+        self.rows = self.bytes_read = self.bytes_written = 0
+
+    def as_dict(self):
+        return {"name": self.name, "depth": self.depth, "ms": round(self.ms, 3), "rows": self.rows,
+                "bytes_read": self.bytes_read, "bytes_written": self.bytes_written}
+
+
+# --- RUNS ---
+def start_run(label="rerun"):
+    if not PERF_ENABLED:
+        return
+    _local.run = {"label": label, "started": time.perf_counter(), "spans": []}
+    _local.stack = []
+
+def finish_run():
+    # Returns the finished run as a dict (for the panel) or None when perf is off / no run started
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    spans = [s.as_dict() for s in run["spans"]]
+    result = {
+        "when": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "label": run["label"],
+        "total_ms": round((time.perf_counter() - run["started"]) * 1000, 3),
+        "rows": sum(s["rows"] for s in spans), "bytes_read": sum(s["bytes_read"] for s in spans),
+        "bytes_written": sum(s["bytes_written"] for s in spans), "spans": spans,
+    }
+    recent_runs.append(result)
+    _write_log(result)
+    return result
+
+
+# --- SPANS ---
+@contextlib.contextmanager
+def span(name):
+    run = getattr(_local, "run", None) if PERF_ENABLED else None
+    if run is None:
+        yield None
+        return
+    s = Span(name, len(_local.stack))
+    run["spans"].append(s)
+    _local.stack.append(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.ms = (time.perf_counter() - started) * 1000
+        _local.stack.pop()
+
+@contextlib.contextmanager
+def section(name):
+    # For st.fragment bodies: a span inside a full rerun, but its own run (logged, shown in the
+    # panel's history) when the fragment reruns on its own and nothing called start_run()
+    if not PERF_ENABLED or getattr(_local, "run", None) is not None:
+        with span(name) as s:
+            yield s
+        return
+    start_run(name)
+    try:
+        with span(name) as s:
+            yield s
+    finally:
+        finish_run()
+
+def timed(name):
+    # Decorator version of span(). Rows are only what the storage layer reports (count() below), so
+    # a loader served from the cache shows 0 rows instead of the frame's length
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def count(rows=0, bytes_read=0, bytes_written=0):
+    # Called from the storage layer; credited to the innermost open span on this thread
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        return
+    s = stack[-1]
+    s.rows += rows
+    s.bytes_read += bytes_read
+    s.bytes_written += bytes_written
+
+
+# --- ROLLING LOG ---
+def _write_log(result):
+    if not PERF_LOG:
+        return
+    line = json.dumps(result) + "\n"
+    try:
+        with _log_lock:
+            if os.path.exists(PERF_LOG) and os.path.getsize(PERF_LOG) + len(line) > PERF_LOG_BYTES:
+                for n in range(PERF_LOG_KEEP - 1, 0, -1):
+                    if os.path.exists(f"{PERF_LOG}.{n}"):
+                        os.replace(f"{PERF_LOG}.{n}", f"{PERF_LOG}.{n + 1}")
+                os.replace(PERF_LOG, f"{PERF_LOG}.1")
+            with open(PERF_LOG, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError:
+        pass  # metrics are best effort; never take the app down over them
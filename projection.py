@@ -0,0 +1,290 @@
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import bank_engine as engine
+from storage import get_store
+
+# --- SAVINGS PROJECTIONS ---
+# Monte Carlo time-to-goal for every client at once. Each client's past deposits are her bootstrap
+# pool: (days since the deposit before it, what it added to savings after the 15% cut). Loans come
+# off in proportion: a client who has borrowed back half of what she saved keeps half of each
+# deposit, so she moves at half speed. A path draws (gap, amount) pairs from her pool until the
+# goal is hit or the horizon runs out. Paths for a block of clients are simulated together as flat
+# arrays, several deposits per pass, and a path leaves the arrays as soon as it's done, so the cost
+# is the deposits actually needed. Each block has its own seed, so the answer doesn't depend on how
+# many workers ran it (--workers spreads the blocks over a process pool).
+# The clock starts today and the first deposit is a whole gap away.
+#   python projection.py                          -> every client, 10k paths each
+#   python projection.py --workers 4 --out projection.csv
+#   python projection.py --client Regina --paths 2000
+
+PATHS = 10_000
+APP_PATHS = 2_000          # The Table: plenty for a chart, quick enough for a rerun
+HORIZON_DAYS = 365
+BLOCK_PATHS = 500_000      # paths simulated together; a block is BLOCK_PATHS // paths clients
+STEP_DEPOSITS = 4          # draws per live path per pass (each is k deposits, see _tuple_tables)
+MAX_DEPOSITS = 5_000       # a path that still isn't there after this many gives up
+QUANTILES = (0.1, 0.5, 0.9)
+BAND_LABELS = ["Bad luck (10%)", "Likely (50%)", "Good luck (90%)"]
+
+
+def client_inputs(ledger):
+    # ledger rows (the whole ledger, or one client's history) -> the bootstrap pools, one
+    # contiguous slice of net / gap per client (offset, count), clients in name order
+    t = pd.to_datetime(ledger["Date"], errors="coerce")
+    df = pd.DataFrame({"Client": ledger["Client"].astype(str), "Type": ledger["Type"].astype(str), "t": t,
+                       "Amount": pd.to_numeric(ledger["Amount"], errors="coerce").fillna(0.0),
+                       "Target": pd.to_numeric(ledger["Target"], errors="coerce")})[t.notna()]
+    balance = pd.to_numeric(ledger["Savings_Balance"], errors="coerce").groupby(df["Client"], sort=False).last()
+    df = df.sort_values(["Client", "t"], kind="stable")
+    by_client = df.groupby("Client", sort=False)
+    clients = pd.Index(by_client.size().index)
+
+    is_deposit = (df["Type"] == "Deposit").to_numpy()
+    deposits = df[is_deposit]
+    prev = deposits.groupby("Client", sort=False)["t"].shift().fillna(deposits["Client"].map(by_client["t"].min()))
+    count = deposits.groupby("Client", sort=False).size().reindex(clients, fill_value=0)
+    loans = df["Amount"].where(df["Type"] == "Withdrawal", 0.0).groupby(df["Client"], sort=False).sum().reindex(clients)
+    net = pd.Series(engine.savings_changes(deposits["Type"], deposits["Amount"]), index=deposits.index)
+    kept = (1 - loans / net.groupby(deposits["Client"], sort=False).sum().reindex(clients)).clip(0, 1).fillna(0.0)
+    net = net * deposits["Client"].map(kept)
+    return {
+        "clients": clients.to_numpy(),
+        "balance": balance.reindex(clients).fillna(0.0).to_numpy(float),
+        "target": by_client["Target"].max().fillna(0.0).to_numpy(float),
+        "offset": np.concatenate([[0], np.cumsum(count.to_numpy())[:-1]]).astype(np.int64),
+        "count": count.to_numpy(np.int64),
+        "net": np.asarray(net, np.float32),
+        "gap": ((deposits["t"] - prev) / pd.Timedelta(days=1)).to_numpy(np.float32),
+    }
+
+
+# --- SIMULATION ---
+# A pool entry is packed as one complex number, net + gap*1j, so a single gather and a single
+# cumsum move a path's savings (real part) and its clock (imaginary part) together. Arrays are
+# (draws, paths): numpy's cumsum down axis 0 is a plain vector add per row.
+# When no deposit in a block can lower savings, each client also gets a table of every k-tuple
+# sum from her pool (m**k entries, up to TUPLE_ENTRIES): one uniform pick from it is exactly k
+# independent deposits, so a draw moves a path k deposits at a time. Only the draw that crosses
+# the goal is taken apart again (its index is the k picks in base m) to find the deposit, and
+# the day, it crossed on.
+TUPLE_ENTRIES = 4096
+MAX_TUPLE = 4
+
+def _has_history(book):
+    # At least one deposit a positive gap after the one before it. A pool of zero gaps (opened and
+    # deposited in the same minute) never moves the clock: every path would get there on day 0
+    owner = np.repeat(np.arange(len(book["count"])), book["count"])
+    return np.bincount(owner, weights=book["gap"] > 0, minlength=len(book["count"])) > 0
+
+def _pool(book):
+    return (book["net"] + 1j * book["gap"]).astype(np.complex64)
+
+def _picks(rng, offset, size, draws):
+    # draws uniform picks per path from [offset, offset + size)
+    u = rng.random((draws, len(offset)), dtype=np.float32)
+    u *= size.astype(np.float32)
+    pick = u.astype(np.int32)
+    np.minimum(pick, size - 1, out=pick)  # float32 can round up to size itself
+    pick += offset
+    return pick
+
+def _tuple_tables(pool, offset, count):
+    # -> (k, table, offset into table, entries) for the block; k = 1 is just the pool
+    monotone = bool((pool.real >= 0).all())
+    k = 1
+    while monotone and k < MAX_TUPLE and all(m ** (k + 1) <= TUPLE_ENTRIES for m in count if m > 0):
+        k += 1
+    if k == 1:
+        return 1, pool, offset, count
+    tables = []
+    for o, m in zip(offset, count):
+        table = pool[o:o + m]
+        for _ in range(k - 1):
+            table = np.add.outer(table, pool[o:o + m]).ravel()  # index = (earlier picks) * m + newest pick
+        tables.append(table)
+    size = count ** k
+    return k, np.concatenate(tables).astype(np.complex64), np.concatenate([[0], np.cumsum(size)[:-1]]).astype(np.int32), size
+
+def _days_to_goal(remaining, count, pool, paths, horizon, seed):
+    # (clients, paths) days until each path reaches remaining; inf = not within the horizon
+    rng = np.random.default_rng(seed)
+    count = count.astype(np.int32)
+    offset = np.concatenate([[0], np.cumsum(count)[:-1]]).astype(np.int32)
+    k, table, table_offset, table_size = _tuple_tables(pool, offset, count)
+    owner = np.repeat(np.arange(len(remaining), dtype=np.int32), paths)
+    days = np.where(np.repeat(remaining <= 0, paths), np.float32(0), np.float32(np.inf))
+    live = np.flatnonzero(np.repeat((remaining > 0) & (count > 0), paths)).astype(np.int32)
+    state = np.zeros(len(live), np.complex64)  # saved + clock*1j
+    for _ in range(0, MAX_DEPOSITS, STEP_DEPOSITS * k):
+        if not live.size:
+            break
+        who = owner[live]
+        goal = remaining[who]
+        pick = _picks(rng, table_offset[who], table_size[who], STEP_DEPOSITS)
+        steps = table[pick]
+        np.cumsum(steps, axis=0, out=steps)
+        steps += state
+        saved = steps.real if k > 1 else np.maximum.accumulate(steps.real, axis=0)  # a loan can dip it back under
+        first = (saved < goal).sum(axis=0)  # draws before the one that gets there
+        reached = np.flatnonzero(first < STEP_DEPOSITS)
+        if reached.size:
+            at = first[reached]
+            if k == 1:
+                when = steps[at, reached].imag
+            else:
+                before = np.where(at > 0, steps[np.maximum(at - 1, 0), reached], state[reached])
+                when = _crossing(before, pick[at, reached] - table_offset[who[reached]], pool,
+                                 offset[who[reached]], count[who[reached]], goal[reached], k)
+            made_it = when <= horizon
+            days[live[reached[made_it]]] = when[made_it]
+        state = steps[-1]
+        going = (first == STEP_DEPOSITS) & (state.imag <= horizon)
+        live, state = live[going], state[going]
+    return days.reshape(len(remaining), paths)
+
+def _crossing(before, index, pool, offset, count, goal, k):
+    # Replays the crossing draw one deposit at a time: its index holds the k picks, earliest first
+    when = np.full(len(before), np.inf, np.float32)
+    running = before.copy()
+    for j in range(k):
+        running += pool[offset + index // count ** (k - 1 - j) % count]
+        now = np.isinf(when) & (running.real >= goal)
+        when[now] = running.imag[now]
+    return when
+
+def _project_block(job):
+    # One block of clients -> (chance of the goal within the horizon, days at each of QUANTILES).
+    # Top-level so a process pool can run it
+    days = _days_to_goal(*job)
+    chance = np.isfinite(days).mean(axis=1)
+    spread = np.quantile(days, QUANTILES, axis=1, method="inverted_cdf").T
+    return chance, np.where(np.isfinite(spread), spread, np.nan)
+
+def _jobs(book, order, paths, horizon, seed):
+    # Blocks of clients in pool-size order (so a block's tuple size suits all of it), each with
+    # its own slice of the pool and its own seed
+    remaining = (book["target"] - book["balance"]).astype(np.float32)
+    pool = _pool(book)
+    per_block = max(1, BLOCK_PATHS // paths)
+    starts = range(0, len(order), per_block)
+    for start, block_seed in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+        block = order[start:start + per_block]
+        slices = [pool[o:o + m] for o, m in zip(book["offset"][block], book["count"][block])]
+        yield (remaining[block], book["count"][block], np.concatenate(slices) if slices else pool[:0],
+               paths, horizon, block_seed)
+
+def project(book, paths=PATHS, horizon=HORIZON_DAYS, workers=1, seed=0):
+    # One row per client: balance, target, deposits on record, the chance of the goal within the
+    # horizon and the days it takes at QUANTILES (blank = not within the horizon on that path).
+    # workers > 1 runs the blocks in a process pool
+    n = len(book["clients"])
+    history = _has_history(book)
+    simulated = dict(book, count=np.where(history, book["count"], 0))  # no history, no paths
+    order = np.argsort(simulated["count"], kind="stable")
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_project_block, _jobs(simulated, order, paths, horizon, seed)))
+    else:
+        results = [_project_block(job) for job in _jobs(simulated, order, paths, horizon, seed)]
+    chance, spread = np.zeros(n), np.zeros((n, len(QUANTILES)))
+    if results:
+        chance[order] = np.concatenate([r[0] for r in results])
+        spread[order] = np.concatenate([r[1] for r in results])
+    has_goal = book["target"] > 0
+    out = pd.DataFrame({
+        "Client": book["clients"], "Balance": book["balance"], "Target": book["target"], "Deposits": book["count"],
+        "Chance": np.where(has_goal, chance, np.nan),
+    }, index=range(n))
+    for q, col in zip(QUANTILES, spread.T):
+        out[f"Days_P{round(q * 100)}"] = np.where(has_goal, col, np.nan)
+    out["Status"] = np.select(
+        [~has_goal, book["balance"] >= book["target"], book["count"] == 0, ~history],
+        ["no goal", "there", "no deposits", "not enough history"], "projected")
+    return out
+
+
+# --- ONE CLIENT'S BALANCE BAND (The Table's chart) ---
+def balance_band(book, paths=APP_PATHS, horizon=HORIZON_DAYS, every_days=7, seed=0, today=None):
+    # Balance at QUANTILES every every_days from today, for a one-client book (client_inputs of her
+    # history), plus her Target. Empty if she's never deposited, or all her deposits landed at once.
+    if not len(book["clients"]) or not _has_history(book)[0]:
+        return pd.DataFrame()
+    rng = np.random.default_rng(seed)
+    pool = _pool(book)
+    offset = np.full(paths, book["offset"][0], np.int32)
+    count = np.full(paths, book["count"][0], np.int32)
+    chunks, clock = [], np.zeros(paths, np.float32)
+    for _ in range(0, MAX_DEPOSITS, STEP_DEPOSITS):
+        steps = pool[_picks(rng, offset, count, STEP_DEPOSITS)]
+        chunks.append(steps)
+        clock += steps.imag.sum(axis=0)
+        if clock.min() > horizon:
+            break
+    steps = np.cumsum(np.concatenate(chunks).T, axis=1)
+    saved, when = steps.real, steps.imag
+    # Deposits each path has made by every grid day: one searchsorted over all paths at once, each
+    # path's times shifted into its own stretch of the number line
+    grid = np.arange(0, horizon + 1, every_days, dtype=np.float64)
+    stretch = float(max(when.max(), horizon)) + 1.0
+    shift = np.arange(paths)[:, None] * stretch
+    made = np.searchsorted((when + shift).ravel(), (grid + shift).ravel(), side="right").reshape(paths, -1)
+    made -= np.arange(paths)[:, None] * when.shape[1]
+    rows = np.arange(paths)[:, None]
+    balance = book["balance"][0] + np.where(made > 0, saved[rows, np.maximum(made - 1, 0)], 0.0)
+    band = pd.DataFrame(np.quantile(balance, QUANTILES, axis=0).T, columns=BAND_LABELS,
+                        index=pd.Timestamp(today or date.today()) + pd.to_timedelta(grid, unit="D"))
+    band["Goal"] = book["target"][0]
+    return band.rename_axis("Date")
+
+
+# --- WHOLE BOOK, KEPT BETWEEN RERUNS ---
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+def book_projection(store, paths=APP_PATHS, horizon=HORIZON_DAYS):
+    # project() over the whole ledger, redone only when the ledger (or the day) changes
+    key = (id(store), store.version("ledger"), paths, horizon, date.today())
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            return _CACHE[key]
+    result = project(client_inputs(store.load("ledger")), paths, horizon)
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _CACHE[key] = result
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo time-to-goal for every client from their deposit history")
+    parser.add_argument("--paths", type=int, default=PATHS, help="simulated futures per client")
+    parser.add_argument("--horizon", type=int, default=HORIZON_DAYS, help="days to look ahead")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread the clients over")
+    parser.add_argument("--client", default=None, help="just this client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write the table to this CSV")
+    args = parser.parse_args()
+
+    store = get_store()
+    started = time.perf_counter()
+    ledger = store.client_history(args.client) if args.client else store.load("ledger")
+    if ledger.empty:
+        sys.exit(f"No ledger rows for {args.client}" if args.client else "The ledger is empty")
+    book = client_inputs(ledger)
+    result = project(book, args.paths, args.horizon, args.workers, args.seed)
+    took = time.perf_counter() - started
+    if args.out:
+        result.to_csv(args.out, index=False)
+    counts = result["Status"].value_counts()
+    print(f"{len(result):,} clients x {args.paths:,} paths in {took:.1f}s: {counts.get('projected', 0):,} projected, "
+          f"{counts.get('there', 0):,} already there, {counts.get('no goal', 0):,} no goal, {counts.get('no deposits', 0):,} no deposits, "
+          f"{counts.get('not enough history', 0):,} not enough history")
+    if not args.out:
+        print(result.sort_values("Chance").to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
@@ -0,0 +1,482 @@
+import contextlib
+import csv
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import perf
+from ledger_index import file_signature
+
+# --- CRASH-SAFE, MULTI-SESSION WRITES ---
+# Several people run the app at once (each Streamlit session is a thread, and there may be more
+# than one server process), so every write to a data file happens under a lock file, full rewrites
+# go through temp-file + rename, and appends go through a tiny write-ahead log with group commit.
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"  # how timestamps are written to every CSV (see format_dates)
+WAL_CHECKPOINT_BATCHES = 64
+WAL_CHECKPOINT_BYTES = 256 * 1024
+
+
+# --- DATES ON DISK ---
+def format_dates(values):
+    # Timestamps -> DATE_FORMAT text (blank for NaT). numpy's formatter is ~15x faster than strftime,
+    # which matters when a whole file gets rewritten
+    text = np.datetime_as_string(values.to_numpy("datetime64[m]"), unit="m")  # "2024-01-03T10:00"
+    return pd.Series(text, index=values.index).str.replace("T", " ", regex=False).where(values.notna(), None)
+
+def dates_as_text(df):
+    dates = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+    return df.assign(**{col: format_dates(df[col]) for col in dates}) if dates else df
+
+
+# --- COMMIT VERSIONS (see totals.py) ---
+# Every write reports (table, version just before its commit, version just after), both read under
+# the write's own lock, to whoever is recording on that thread. Totals.apply uses it to tell "only
+# my rows landed" from "somebody else's slipped in too".
+_commits = threading.local()
+
+@contextlib.contextmanager
+def recording_commits():
+    outer = getattr(_commits, "log", None)
+    log = _commits.log = []
+    try:
+        yield log
+    finally:
+        _commits.log = outer
+
+def record_commit(table, before, after):
+    log = getattr(_commits, "log", None)
+    if log is not None:
+        log.append((table, before, after))
+
+
+# --- FILE LOCKS ---
+try:
+    import fcntl
+
+    def _lock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after ~10s; keep waiting
+
+    def _unlock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+_held = threading.local()
+
+@contextlib.contextmanager
+def file_lock(file_path):
+    # Exclusive across threads and processes. Re-entrant within a thread.
+    key = os.path.abspath(file_path)
+    with _THREAD_LOCKS_GUARD:
+        thread_lock = _THREAD_LOCKS.setdefault(key, threading.RLock())
+    with thread_lock:
+        held = getattr(_held, "paths", None)
+        if held is None:
+            held = _held.paths = set()
+        if key in held:
+            yield
+            return
+        fd = os.open(key + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock_fd(fd)
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+                _unlock_fd(fd)
+        finally:
+            os.close(fd)
+
+
+# --- ATOMIC REWRITES ---
+def fsync_dir(file_path):
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write_csv(df, file_path):
+    # A crash leaves either the old file or the new one, never half of each
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            dates_as_text(df).to_csv(f, index=False, lineterminator="\n")
+            f.flush()
+            os.fsync(f.fileno())
+        perf.count(rows=len(df), bytes_written=os.path.getsize(tmp_path))
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    fsync_dir(file_path)
+
+def read_header(file_path):
+    with open(file_path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+def _ends_with_newline(file_path):
+    with open(file_path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b"\n", b"\r")
+
+def _ends_before(file_path, offset):
+    with open(file_path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) in (b"\n", b"\r")
+
+def _append_text(df, file_path):
+    # (offset, text) for appending df to a CSV: header only on an empty file, newline fixed up if missing
+    offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    text = dates_as_text(df).to_csv(index=False, header=offset == 0, lineterminator="\n")
+    if offset and not _ends_with_newline(file_path):
+        text = "\n" + text
+    return offset, text
+
+def tail_offset(file_path, rows):
+    # Byte offset where the last `rows` records of a CSV start. Reads backwards from the end in
+    # growing chunks, so it costs the size of the tail, not the file. A newline only ends a record
+    # if an even number of quotes follows it (anything else is inside a quoted field).
+    size = os.path.getsize(file_path)
+    if rows <= 0:
+        return size
+    chunk = 64 * 1024
+    with open(file_path, "rb") as f:
+        while True:
+            start = max(0, size - chunk)
+            f.seek(start)
+            data = np.frombuffer(f.read(size - start), dtype=np.uint8)
+            quotes_after = np.bitwise_xor.accumulate((data == ord('"')).astype(np.uint8)[::-1])[::-1]
+            newlines = np.flatnonzero(data[:-1] == ord("\n"))  # a newline on the last byte ends the file, not a record
+            ends = newlines[quotes_after[newlines + 1] == 0]
+            perf.count(bytes_read=len(data))
+            if len(ends) >= rows:
+                return start + int(ends[-rows]) + 1
+            if start == 0:
+                raise ValueError(f"{file_path} has fewer than {rows} rows")
+            chunk *= 8
+
+
+# --- MULTI-FILE TRANSACTIONS ---
+# For changes that must land in several CSVs together (a goal transfer touches goals.csv AND the
+# Burn Book). Inside `with CsvTransaction(journal, paths) as tx:` every file is locked and writes
+# are only staged in memory, so an exception in the block is the whole rollback: nothing on disk or
+# in any cache was touched. On a clean exit the staged bytes go to the journal in one fsynced write
+# (the commit point), then each file gets exactly one durable write (rewrites via temp + rename,
+# appends and tail rewrites at the offset recorded in the journal) and the journal is deleted. A crash in between is
+# rolled forward by recover_journal(), which the stores call on open and before every transaction.
+class CsvTransaction:
+    def __init__(self, journal_path, paths):
+        self.journal_path = journal_path
+        self.paths = sorted(os.path.abspath(p) for p in paths)  # fixed lock order, no deadlocks
+        self.ops = {}
+        self._locks = None
+        self.before = {}   # path -> file_signature once the locks are held
+        self.after = {}    # path -> file_signature after the commit, before they're released
+
+    def __enter__(self):
+        self._locks = contextlib.ExitStack()
+        try:
+            self._locks.enter_context(file_lock(self.journal_path))
+            for path in self.paths:
+                self._locks.enter_context(file_lock(path))
+            _recover_journal_locked(self.journal_path)
+            self.before = {path: file_signature(path) for path in self.paths}
+        except BaseException:
+            self._locks.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and self.ops:
+                self._commit()
+                self.after = {path: file_signature(path) for path in self.paths}
+        finally:
+            self._locks.close()
+        return False
+
+    def read(self, file_path):
+        df = pd.read_csv(file_path)
+        perf.count(rows=len(df), bytes_read=os.path.getsize(file_path))
+        return df
+
+    # One op per file per transaction
+    def rewrite(self, file_path, df):
+        text = dates_as_text(df).to_csv(index=False, lineterminator="\n")
+        self.ops[os.path.abspath(file_path)] = {"kind": "rewrite", "data": text}
+
+    def append(self, file_path, df):
+        offset, text = _append_text(df, file_path)
+        self.ops[os.path.abspath(file_path)] = {"kind": "append", "offset": offset, "data": text}
+
+    def replace_tail(self, file_path, offset, df):
+        # Everything from `offset` (a record start, see tail_offset) to the end becomes df's rows
+        text = dates_as_text(df).to_csv(index=False, header=False, lineterminator="\n")
+        if offset and not _ends_before(file_path, offset):
+            text = "\n" + text
+        self.ops[os.path.abspath(file_path)] = {"kind": "tail", "offset": offset, "data": text}
+
+    def _commit(self):
+        ops = [dict(op, path=path) for path, op in self.ops.items()]
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ops": ops}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        fsync_dir(self.journal_path)
+        _apply_ops(ops)
+        os.remove(self.journal_path)
+
+
+def _apply_ops(ops):
+    # Idempotent, so rolling a journal forward twice is harmless
+    for op in ops:
+        data = op["data"].encode("utf-8")
+        if op["kind"] == "rewrite":
+            tmp_path = op["path"] + ".txn.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, op["path"])
+        elif op["kind"] == "tail":
+            with open(op["path"], "rb+") as f:
+                f.seek(op["offset"])
+                f.write(data)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(op["path"], "rb+" if os.path.exists(op["path"]) else "wb+") as f:
+                f.seek(op["offset"])
+                if f.read(len(data)) != data:
+                    f.seek(op["offset"])
+                    f.truncate()
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        perf.count(bytes_written=len(data))
+        fsync_dir(op["path"])
+
+def _recover_journal_locked(journal_path):
+    if not os.path.exists(journal_path):
+        return False
+    try:
+        with open(journal_path, encoding="utf-8") as f:
+            ops = json.loads(f.read())["ops"]
+    except (ValueError, KeyError):
+        ops = None  # torn journal: the commit never happened, nothing was applied
+    if ops:
+        _apply_ops(ops)
+    os.remove(journal_path)
+    return bool(ops)
+
+def committed_bytes(file_path, journal_path=None):
+    # The file's bytes as recovery would leave them, without writing anything: a crashed
+    # transaction's journal, then the file's own write-ahead log, rolled forward in memory.
+    # Caller holds file_lock(file_path)
+    data = b""
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as f:
+            data = f.read()
+    ops = []
+    if journal_path and os.path.exists(journal_path):
+        try:
+            with open(journal_path, encoding="utf-8") as f:
+                ops = [op for op in json.loads(f.read())["ops"] if op["path"] == os.path.abspath(file_path)]
+        except (ValueError, KeyError):
+            ops = []  # torn journal: never committed
+    if os.path.exists(file_path + ".wal"):
+        with open(file_path + ".wal", encoding="utf-8") as w:
+            for line in w.read().split("\n"):
+                try:
+                    ops.append(dict(json.loads(line), kind="append"))
+                except ValueError:
+                    break  # torn last record: never acknowledged
+    for op in ops:
+        new = op["data"].encode("utf-8")
+        if op["kind"] == "rewrite":
+            data = new
+        elif op["kind"] == "tail" or data[op["offset"]:op["offset"] + len(new)] != new:
+            data = data[:op["offset"]] + new
+    return data
+
+def recover_journal(journal_path, paths):
+    # Finish a transaction a crashed process committed but didn't get to apply
+    if not os.path.exists(journal_path):
+        return False
+    with CsvTransaction(journal_path, paths):
+        return True
+
+
+# --- WRITE-AHEAD LOG + GROUP COMMIT ---
+# Every batch is written to <file>.wal as one JSON line {"offset", "data"} and fsynced; that is the
+# commit point. The CSV bytes are then appended without their own fsync. Concurrent callers queue
+# up behind whoever is flushing and go out together in the next batch, so N clicks cost one fsync.
+# Every so often (and before any full rewrite) the CSV is fsynced and the log truncated. After a
+# crash, replaying the log puts back any batch whose bytes didn't make it into the CSV.
+class CsvAppender:
+    def __init__(self, file_path, columns, prepare=None, on_commit=None, table=None):
+        self.file_path = file_path
+        self.table = table            # commits are reported under this name (record_commit)
+        self.wal_path = file_path + ".wal"
+        self.columns = columns
+        self.prepare = prepare        # called with the batch (under the lock) before it is encoded
+        self.on_commit = on_commit    # called with a frame of the committed rows (still under the lock)
+        self.batches = 0
+        self.commits = 0
+        self.fsyncs = 0
+        self._wal_signature = ()      # what the log looked like when we last left it
+        self._batches_since_checkpoint = 0
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flushing = False
+
+    # --- PUBLIC ---
+    def submit(self, row, **extra):
+        return self._submit(dict(extra, row=row))["row"]
+
+    def submit_frame(self, frame, **extra):
+        # A whole DataFrame of rows as one item, e.g. a bulk import: still one log record, one fsync
+        return self._submit(dict(extra, frame=frame))["frame"]
+
+    def _submit(self, item):
+        item.update(done=False, error=None)
+        with self._cond:
+            self._pending.append(item)
+            while not item["done"]:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                batch, self._pending = self._pending, []
+                self._flushing = True
+                self._cond.release()
+                try:
+                    self._flush(batch)
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    self._cond.notify_all()
+        if item["error"] is not None:
+            raise item["error"]
+        if "versions" in item:
+            record_commit(self.table, *item["versions"])  # on the submitter's thread, not the flusher's
+        return item
+
+    def recover(self):
+        with file_lock(self.file_path):
+            self._recover_if_needed()
+
+    def checkpoint(self):
+        # Caller must hold file_lock(self.file_path)
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "rb+") as f:
+                os.fsync(f.fileno())
+                self.fsyncs += 1
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > 0:
+            with open(self.wal_path, "w") as w:
+                os.fsync(w.fileno())
+        self._batches_since_checkpoint = 0
+        self._wal_signature = file_signature(self.wal_path)
+
+    # --- INTERNALS ---
+    def _recover_if_needed(self):
+        if file_signature(self.wal_path) == self._wal_signature:
+            return
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > 0:
+            self._replay()
+        self.checkpoint()
+
+    def _replay(self):
+        with open(self.wal_path, encoding="utf-8") as w:
+            lines = w.read().split("\n")
+        mode = "rb+" if os.path.exists(self.file_path) else "wb+"
+        with open(self.file_path, mode) as f:
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn last record: that batch was never acknowledged
+                data = record["data"].encode("utf-8")
+                f.seek(record["offset"])
+                if f.read(len(data)) != data:
+                    f.seek(record["offset"])
+                    f.truncate()
+                    f.write(data)
+            f.flush()
+
+    def _flush(self, batch):
+        try:
+            with file_lock(self.file_path):
+                self._recover_if_needed()
+                if self.prepare:
+                    self.prepare(batch)
+                committed = self._batch_frame(batch)
+                offset, text = _append_text(committed, self.file_path)
+                before = file_signature(self.file_path)
+
+                with open(self.wal_path, "a", encoding="utf-8") as w:
+                    w.write(json.dumps({"offset": offset, "data": text}) + "\n")
+                    w.flush()
+                    os.fsync(w.fileno())
+                self.fsyncs += 1
+                data = text.encode("utf-8")
+                with open(self.file_path, "ab") as f:
+                    f.write(data)
+                perf.count(rows=len(committed), bytes_written=2 * len(data))  # log + CSV
+                if len(batch) == 1 and self.table:
+                    batch[0]["versions"] = (before, file_signature(self.file_path))  # a shared batch isn't anyone's alone
+
+                self.batches += 1
+                self.commits += len(committed)
+                self._batches_since_checkpoint += 1
+                self._wal_signature = file_signature(self.wal_path)
+                if (self._batches_since_checkpoint >= WAL_CHECKPOINT_BATCHES
+                        or os.path.getsize(self.wal_path) >= WAL_CHECKPOINT_BYTES):
+                    self.checkpoint()
+                if self.on_commit:
+                    self.on_commit(committed)
+        except Exception as e:
+            for item in batch:
+                item["error"] = e
+        finally:
+            for item in batch:
+                item["done"] = True
+
+    def _batch_frame(self, batch):
+        # Keep submission order; runs of single rows become one frame
+        frames, rows = [], []
+        for item in batch:
+            if "frame" in item:
+                if rows:
+                    frames.append(pd.DataFrame(rows, columns=self.columns))
+                    rows = []
+                frames.append(item["frame"].reindex(columns=self.columns))
+            else:
+                rows.append(item["row"])
+        if rows:
+            frames.append(pd.DataFrame(rows, columns=self.columns))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import bank_engine as engine
+from storage import get_store
+
+# --- DEPOSIT SCHEDULER ---
+# Works out, for every client at once, when their next deposit was due (last Deposit, or the day
+# they joined, plus 7 days for Weekly / 14 for Bi-Weekly; "Whenever" is never late). Anyone past it
+# gets the $5/day late fee for the days nobody has charged yet, all posted as ONE commit; anyone
+# due in the next couple of days gets a reminder queued in reminders.jsonl. Safe to run every day
+# from cron: a second run the same day finds nothing new to charge or remind about.
+#   python scheduler.py              -> just show who's due / late
+#   python scheduler.py --charge     -> post the late fees, queue reminders
+#   python scheduler.py --remind     -> reminders for everyone due or late, no fees
+
+PERIOD_DAYS = {"Weekly": 7, "Bi-Weekly": 14}
+REMIND_DAYS_AHEAD = 2
+REMINDERS_FILE = "reminders.jsonl"
+STATE_FILE = ".scheduler_state.json"   # last due date each client was reminded about
+
+
+def build_schedule(ledger, today):
+    # One row per client: frequency, target, last deposit, next due date, days late and the days
+    # still unbilled (since the due date or the last Penalty/Waived row, whichever is later)
+    if ledger.empty:
+        return pd.DataFrame(columns=["Client", "Frequency", "Target", "Last_Deposit", "Due", "Days_Late", "Unbilled_Days", "Status"])
+    client = ledger["Client"]
+    day = pd.to_datetime(ledger["Date"], errors="coerce").dt.normalize()  # stores hand back real timestamps
+    by_client = lambda values: values.groupby(client, sort=False)
+    freq = ledger["Frequency"].fillna("").astype(str)
+
+    sched = pd.DataFrame({
+        "Frequency": by_client(freq.where(freq != "")).last(),
+        "Target": by_client(pd.to_numeric(ledger["Target"], errors="coerce")).max(),
+        "Opened": by_client(day).min(),
+        "Last_Deposit": by_client(day.where(ledger["Type"] == "Deposit")).max(),
+        "Last_Fee": by_client(day.where(ledger["Type"].isin(["Penalty", "Waived"]))).max(),
+    })
+    sched["Frequency"] = sched["Frequency"].fillna("")
+    sched["Target"] = sched["Target"].fillna(0.0)
+
+    today = pd.Timestamp(today)
+    period = pd.to_timedelta(sched["Frequency"].map(PERIOD_DAYS), unit="D")
+    sched["Due"] = sched["Last_Deposit"].fillna(sched["Opened"]) + period
+    billed_until = sched[["Due", "Last_Fee"]].max(axis=1)
+    days_late = (today - sched["Due"]).dt.days
+    sched["Days_Late"] = days_late.clip(lower=0).fillna(0).astype(int)
+    sched["Unbilled_Days"] = (today - billed_until).dt.days.where(days_late > 0).clip(lower=0).fillna(0).astype(int)
+    sched["Status"] = np.select(
+        [period.isna(), days_late > 0, days_late >= -REMIND_DAYS_AHEAD],
+        ["whenever", "late", "due"], "ok")
+    return sched.drop(columns=["Opened", "Last_Fee"]).rename_axis("Client").reset_index()
+
+
+def _load_state(state_file):
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"reminded": {}}
+
+def _save_state(state, state_file):
+    tmp_path = state_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_file)
+
+
+def queue_reminders(sched, today, reminders_file=REMINDERS_FILE, state_file=STATE_FILE):
+    # One reminder per client per due date, appended in a single write
+    state = _load_state(state_file)
+    due = sched["Due"].dt.strftime("%Y-%m-%d")
+    already = sched["Client"].map(state["reminded"]).eq(due)
+    todo = sched[~already]
+    if todo.empty:
+        return todo
+    queued = datetime.now().strftime("%Y-%m-%d %H:%M")
+    lines = [json.dumps({"queued": queued, "client": row.Client, "status": row.Status, "due": d,
+                         "days_late": int(row.Days_Late), "message": _message(row, today)}) + "\n"
+             for row, d in zip(todo.itertuples(index=False), due[~already])]
+    with open(reminders_file, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+    state["reminded"].update(zip(todo["Client"], due[~already]))
+    _save_state(state, state_file)
+    return todo
+
+def _message(row, today):
+    if row.Status == "late":
+        return f"{row.Client}, your {row.Frequency.lower()} deposit is {row.Days_Late} day(s) late. That's ${engine.late_fee(row.Days_Late):.2f} and counting."
+    return f"{row.Client}, your {row.Frequency.lower()} deposit is due {row.Due:%A}. Don't make it weird."
+
+
+def run_schedule(store=None, today=None, charge=False, remind=True, dry_run=False,
+                 reminders_file=REMINDERS_FILE, state_file=STATE_FILE):
+    # Returns (schedule, penalties posted or planned, reminders queued or planned)
+    store = store or get_store()
+    today = today or date.today()
+    sched = build_schedule(store.load("ledger"), today)
+
+    late = sched[(sched["Status"] == "late") & (sched["Unbilled_Days"] > 0)]
+    penalties = [engine.penalty(row.Client, row.Unbilled_Days, note=f"Late Fee (auto, {row.Unbilled_Days} days)")
+                 for row in late.itertuples(index=False)] if charge else []
+    wanted = ["due", "late"] if not charge else ["due"]
+    reminders = sched[sched["Status"].isin(wanted)] if remind else sched.iloc[0:0]
+
+    if dry_run:
+        return sched, penalties, reminders
+    if penalties:
+        now = datetime.combine(today, datetime.now().time())
+        engine.post(store, penalties, now=now)  # one commit for everybody
+    if not reminders.empty:
+        reminders = queue_reminders(reminders, today, reminders_file, state_file)
+    return sched, penalties, reminders
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find late / due clients from their deposit Frequency; charge fees, queue reminders")
+    parser.add_argument("--charge", action="store_true", help="post late fees for unbilled late days (one commit)")
+    parser.add_argument("--remind", action="store_true", help="queue reminders only, for late and due clients")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="pretend it's this date (YYYY-MM-DD)")
+    parser.add_argument("--dry-run", action="store_true", help="show what would happen without writing")
+    args = parser.parse_args()
+
+    acting = args.charge or args.remind
+    sched, penalties, reminders = run_schedule(today=args.today, charge=args.charge, remind=acting,
+                                               dry_run=args.dry_run or not acting)
+    counts = sched["Status"].value_counts()
+    print(f"{len(sched):,} clients: {counts.get('late', 0):,} late, {counts.get('due', 0):,} due soon, "
+          f"{counts.get('ok', 0):,} fine, {counts.get('whenever', 0):,} whenever")
+    if not acting:
+        late = sched[sched["Status"] == "late"].sort_values("Days_Late", ascending=False)
+        if not late.empty:
+            print(late[["Client", "Frequency", "Due", "Days_Late", "Unbilled_Days"]].to_string(index=False))
+        sys.exit(0)
+    verb = "Would" if args.dry_run else "Did"
+    print(f"{verb} charge {len(penalties):,} late fees (${sum(p.amount for p in penalties):,.2f}) "
+          f"and queue {len(reminders):,} reminders")
@@ -0,0 +1,839 @@
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+import perf
+from ledger_index import file_signature, get_ledger_index
+from safe_io import (DATE_FORMAT, CsvAppender, CsvTransaction, atomic_write_csv, committed_bytes, file_lock, format_dates,
+                     read_header, record_commit, recover_journal, tail_offset)
+
+# --- FILES & COLUMNS ---
+CLIENT_FILE = "ledger.csv"
+PERSONAL_FILE = "my_budget.csv"
+GOALS_FILE = "goals.csv"
+DB_FILE = "bank.db"
+TXN_JOURNAL = "transactions.wal"  # multi-file commits (goal transfers) in flight
+CHUNK_ROWS = 50_000               # rows per chunk for iter_chunks() (exports)
+
+CLIENT_COLUMNS = ["Date", "Client", "Type", "Amount", "Note", "Savings_Balance", "Niece_Earnings", "Target", "Frequency"]
+PERSONAL_COLUMNS = ["Date", "Category", "Item", "Amount", "Sass_Level"]
+GOAL_COLUMNS = ["Goal_ID", "Name", "Target", "Balance"]
+
+TABLES = {
+    "ledger": {"file": CLIENT_FILE, "columns": CLIENT_COLUMNS},
+    "budget": {"file": PERSONAL_FILE, "columns": PERSONAL_COLUMNS},
+    "goals": {"file": GOALS_FILE, "columns": GOAL_COLUMNS},
+}
+
+DEFAULT_GOALS = {
+    "Goal_ID": ["Goal 1", "Goal 2", "Goal 3"],
+    "Name": ["Spring Fling Dress", "College", "Pink Jeep"],
+    "Target": [1000.0, 5000.0, 300.0],
+    "Balance": [0.0, 0.0, 0.0]
+}
+
+
+def _move_goal_balance(goals, goal_name, amount_change):
+    hit = goals["Name"] == goal_name
+    if not hit.any():
+        raise ValueError(f"No goal named {goal_name!r}")
+    balance = float(goals.loc[hit, "Balance"].iloc[0])
+    if balance + amount_change < -0.005:
+        raise ValueError(f"{goal_name} only has ${balance:,.2f} in it")
+    goals.loc[hit, "Balance"] = balance + amount_change
+
+
+def _same_rows(current, expected):
+    # Stale-edit check for apply_edits: 10 == 10.0 and blank == blank, everything else compared as text
+    if len(current) != len(expected):
+        return False
+    for col in expected.columns:
+        a, b = current[col].reset_index(drop=True), expected[col].reset_index(drop=True)
+        same = (a.isna() & b.isna()) | (pd.to_numeric(a, errors="coerce") == pd.to_numeric(b, errors="coerce")) \
+            | (a.astype(str) == b.astype(str))
+        if not same.all():
+            return False
+    return True
+
+STALE_EDIT = "Somebody else changed those rows while you were editing. Reload and try again."
+
+
+# --- SCHEMA VERSIONS & MIGRATIONS ---
+# Typed column definitions for every table. Each data file carries the schema version it was last
+# upgraded to (schema.json next to the CSVs, the meta table in bank.db). A file below
+# SCHEMA_VERSION, or with a header that isn't ours (an old Maya_Gift 7-column ledger), is upgraded
+# once, on disk, when a store opens. After that a load is a plain typed read: no dtype guessing,
+# no column patching, and Date comes back as a real timestamp (always written as DATE_FORMAT, so
+# parsing it is one fixed-format pass).
+#   python storage.py upgrade   -> run the migrations now
+SCHEMA_VERSION = 3
+SCHEMA_FILE = "schema.json"
+
+TEXT, NUMBER, TIMESTAMP = "str", "float64", "datetime64[ns]"
+COLUMN_TYPES = {
+    "ledger": {"Date": TIMESTAMP, "Client": TEXT, "Type": TEXT, "Amount": NUMBER, "Note": TEXT,
+               "Savings_Balance": NUMBER, "Niece_Earnings": NUMBER, "Target": NUMBER, "Frequency": TEXT},
+    "budget": {"Date": TIMESTAMP, "Category": TEXT, "Item": TEXT, "Amount": NUMBER, "Sass_Level": TEXT},
+    "goals": {"Goal_ID": TEXT, "Name": TEXT, "Target": NUMBER, "Balance": NUMBER},
+}
+
+def _empty(table):
+    return pd.DataFrame({col: pd.Series(dtype=kind) for col, kind in COLUMN_TYPES[table].items()})
+
+def _csv_dtypes(table):
+    return {col: TEXT if kind == TIMESTAMP else kind for col, kind in COLUMN_TYPES[table].items()}
+
+def _read_typed(source, table, **kwargs):
+    # read_csv with our dtypes. Dates are read as text and parsed in one strict fixed-format pass;
+    # a date in any other format raises ValueError (the caller upgrades the file)
+    types = COLUMN_TYPES[table]
+    df = pd.read_csv(source, dtype=_csv_dtypes(table), **kwargs)
+    for col in df.columns:
+        if types.get(col) == TIMESTAMP:
+            df[col] = pd.to_datetime(df[col], format=DATE_FORMAT)
+    return df
+
+def _read_typed_chunks(source, table, chunk_rows):
+    # _read_typed a chunk at a time. Dates parse leniently here: an export shouldn't die on one odd row
+    with pd.read_csv(source, dtype=_csv_dtypes(table), chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield _typed(table, chunk)
+
+def parse_dates(values):
+    # Anything date-like -> timestamps. The fixed format first (fast), whatever's left the slow way;
+    # unreadable -> NaT
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype(TIMESTAMP)
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+    rest = parsed.isna() & values.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest].astype(str), format="mixed", errors="coerce")
+    return parsed.astype(TIMESTAMP)
+
+def _typed(table, df):
+    # Our columns, in order, with our types; a number or date that won't parse becomes blank
+    df = df.reindex(columns=list(COLUMN_TYPES[table]))
+    for col, kind in COLUMN_TYPES[table].items():
+        if kind == NUMBER:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        elif kind == TIMESTAMP:
+            df[col] = parse_dates(df[col])
+        else:
+            df[col] = df[col].astype(TEXT)
+    return df
+
+def _window(df, client=None, start=None, end=None):
+    # Rows for one client (if given) with start <= Date < end (either end open)
+    keep = pd.Series(True, index=df.index)
+    if client is not None:
+        keep &= df["Client"] == client
+    if start is not None:
+        keep &= df["Date"] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= df["Date"] < pd.Timestamp(end)
+    return df[keep]
+
+def _sql_window(client=None, start=None, end=None):
+    # The same filter as a WHERE clause (dates compare as DATE_FORMAT text)
+    clauses, params = [], []
+    if client is not None:
+        clauses, params = clauses + ["Client = ?"], params + [client]
+    if start is not None:
+        clauses, params = clauses + ["Date >= ?"], params + [f"{pd.Timestamp(start):{DATE_FORMAT}}"]
+    if end is not None:
+        clauses, params = clauses + ["Date < ?"], params + [f"{pd.Timestamp(end):{DATE_FORMAT}}"]
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def _sql_rows(table, df):
+    # Rows for executemany: our columns and types, timestamps as DATE_FORMAT text, blanks as NULL
+    df = _typed(table, df)
+    rows = df.astype(object)
+    for col, kind in COLUMN_TYPES[table].items():
+        if kind == TIMESTAMP:
+            rows[col] = format_dates(df[col])
+    return rows.where(df.notna(), None).itertuples(index=False, name=None)
+
+def _v1_ledger_columns(table, df):
+    # v1: the ledger grew Target and Frequency (the Maya_Gift ledger never had them)
+    if table == "ledger":
+        if "Target" not in df.columns: df["Target"] = 0.0
+        if "Frequency" not in df.columns: df["Frequency"] = ""
+    return df
+
+def _v2_typed_columns(table, df):
+    # v2: our columns in our order; a number that won't parse becomes blank instead of turning the
+    # whole column into text
+    df = df.reindex(columns=list(COLUMN_TYPES[table]))
+    for col, kind in COLUMN_TYPES[table].items():
+        if kind == NUMBER:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def _v3_timestamps(table, df):
+    # v3: every Date rewritten as DATE_FORMAT ("2024-01-03" -> "2024-01-03 00:00")
+    return _typed(table, df)
+
+MIGRATIONS = [(1, _v1_ledger_columns), (2, _v2_typed_columns), (3, _v3_timestamps)]
+
+def _upgrade_frame(table, df, version):
+    for target, step in MIGRATIONS:
+        if version < target:
+            df = step(table, df)
+    return df
+
+def _read_versions(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_versions(versions, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# --- LOADER CACHE ---
+# Streamlit reruns the whole script on every click, so the same unchanged file would get
+# parsed over and over. Frames are cached per table, keyed on the file's (size, mtime), and
+# the stores invalidate explicitly after their own writes (mtime can be too coarse to notice).
+class LoaderCache:
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, signature, loader, rows=None):
+        # rows: just those positions (copied), instead of a copy of the whole frame
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                return (cached[1] if rows is None else cached[1].iloc[rows]).copy()
+            self.misses += 1
+        df = loader()
+        with self.lock:
+            self.entries[key] = (signature, df)
+        return (df if rows is None else df.iloc[rows]).copy()
+
+    def invalidate(self, key=None):
+        with self.lock:
+            self.invalidations += 1
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0, "entries": len(self.entries),
+            }
+
+
+LOADER_CACHE = LoaderCache()
+
+
+# ==========================
+# CSV BACKEND (the default)
+# ==========================
+class CsvStore:
+    name = "csv"
+    csv_tables = ("ledger", "budget", "goals")  # the tables kept as CSV files (ParquetStore takes the ledger out)
+
+    def __init__(self, root="."):
+        self.root = root
+        self.lock = threading.RLock()
+        # Appends go through the write-ahead log / group commit in safe_io.py
+        self.appenders = {"budget": CsvAppender(self.path("budget"), PERSONAL_COLUMNS, table="budget",
+                                                on_commit=lambda committed: LOADER_CACHE.invalidate(self.path("budget")))}
+        if "ledger" in self.csv_tables:
+            self.appenders["ledger"] = CsvAppender(self.path("ledger"), CLIENT_COLUMNS, table="ledger",
+                                                   prepare=self._apply_balances, on_commit=self._ledger_committed)
+        self.journal_path = os.path.join(root, TXN_JOURNAL)
+        recover_journal(self.journal_path, [self.path("goals"), self.path("budget")])
+        for appender in self.appenders.values():
+            appender.recover()  # finish anything a crashed process left in the log
+        self.upgraded = self.migrate(self.csv_tables)
+
+    def path(self, table):
+        return os.path.join(self.root, TABLES[table]["file"])
+
+    def exists(self, table):
+        return os.path.exists(self.path(table))
+
+    def version(self, table):
+        # Changes whenever the table does (ours or anyone else's write); see totals.py
+        return file_signature(self.path(table))
+
+    def load(self, table, rows=None):
+        path = self.path(table)
+        if not os.path.exists(path):
+            if table == "goals":
+                df = pd.DataFrame(DEFAULT_GOALS)
+                self.replace("goals", df)
+                return df
+            return _empty(table)
+        return LOADER_CACHE.get(path, file_signature(path), lambda: self._read(table), rows)
+
+    def _read(self, table):
+        path = self.path(table)
+        try:
+            if read_header(path) != TABLES[table]["columns"]:
+                raise ValueError("not our header")
+            df = _read_typed(path, table)
+        except ValueError:
+            # Somebody swapped in an old-layout file, or typed text into a number column, since we
+            # opened: upgrade it on disk (once) and read again
+            self.migrate([table], force=True)
+            df = _read_typed(path, table)
+        perf.count(rows=len(df), bytes_read=os.path.getsize(path))
+        return df
+
+    # --- SCHEMA MIGRATION (see SCHEMA_VERSION) ---
+    def migrate(self, tables=None, force=False):
+        # Upgrades every file below SCHEMA_VERSION in place; returns {table: version it was at}.
+        # A file that doesn't exist yet will be created in the current layout, so it's recorded as current.
+        schema_path = os.path.join(self.root, SCHEMA_FILE)
+        upgraded = {}
+        with self.lock, file_lock(schema_path):
+            versions = _read_versions(schema_path)
+            recorded = dict(versions)
+            for table in tables or TABLES:
+                path, name = self.path(table), TABLES[table]["file"]
+                if not os.path.exists(path) or os.path.getsize(path) == 0:
+                    versions.setdefault(name, SCHEMA_VERSION)
+                    continue
+                with file_lock(path):
+                    version = versions.get(name, 1) if read_header(path) == TABLES[table]["columns"] else 0
+                    if force:
+                        version = min(version, SCHEMA_VERSION - 1)
+                    if version < SCHEMA_VERSION:
+                        if table in self.appenders:
+                            self.appenders[table].checkpoint()  # log offsets mean nothing after a rewrite
+                        df = _upgrade_frame(table, pd.read_csv(path, low_memory=False), version)
+                        atomic_write_csv(df, path)
+                        LOADER_CACHE.invalidate(path)
+                        upgraded[table] = version
+                    versions[name] = SCHEMA_VERSION
+            if versions != recorded:
+                _write_versions(versions, schema_path)
+        return upgraded
+
+    def append(self, table, row):
+        return self.appenders[table].submit(row)
+
+    def post_client_transaction(self, row, savings_change):
+        # Savings_Balance is filled in at commit time, under the file lock, from the freshest balance
+        return self.appenders["ledger"].submit(row, savings_change=savings_change)
+
+    def post_client_transactions(self, df, savings_changes):
+        # Bulk version: the whole frame goes out as a single commit
+        return self.appenders["ledger"].submit_frame(df.reset_index(drop=True),
+                                                     savings_change=pd.Series(savings_changes).reset_index(drop=True))
+
+    def _apply_balances(self, batch):
+        index = self.ledger_index().refresh()
+        running = {}
+        def start(client):
+            return running.get(client, index.clients.get(client, {}).get("balance", 0.0))
+        for item in batch:
+            if item.get("savings_change") is None:
+                continue
+            if "frame" in item:
+                frame, changes = item["frame"], item["savings_change"].astype(float)
+                base = {client: start(client) for client in frame["Client"].unique()}
+                frame["Savings_Balance"] = frame["Client"].map(base) + changes.groupby(frame["Client"]).cumsum()
+                running.update(frame.groupby("Client", sort=False)["Savings_Balance"].last().to_dict())
+            else:
+                row = item["row"]
+                row["Savings_Balance"] = start(row["Client"]) + item["savings_change"]
+                running[row["Client"]] = row["Savings_Balance"]
+
+    def _ledger_committed(self, committed):
+        LOADER_CACHE.invalidate(self.path("ledger"))
+        self.ledger_index().record_many(committed)
+
+    def replace(self, table, df):
+        path = self.path(table)
+        with self.lock, file_lock(path):
+            if table in self.appenders:
+                self.appenders[table].checkpoint()  # log offsets mean nothing after a rewrite
+            before = self.version(table)
+            atomic_write_csv(df, path)
+            record_commit(table, before, self.version(table))
+            LOADER_CACHE.invalidate(path)
+
+    def apply_edits(self, table, before, after, inserted):
+        # Row-level edits; index = row position in load(table). Rows in `before` become `after`
+        # (missing from `after` = deleted), `inserted` goes on the end. Only the file from the first
+        # touched row on is rewritten, through the transaction journal, so fixing a recent entry costs
+        # a few KB however long the file is. Raises ValueError if the rows moved under the editor.
+        path, columns = self.path(table), TABLES[table]["columns"]
+        if not self.exists(table):
+            self.replace(table, _typed(table, inserted))
+            return
+        total = len(self.load(table))  # (also upgrades the file if it isn't in our layout)
+        first = int(before.index.min()) if len(before) else total
+        with self.lock, CsvTransaction(self.journal_path, [path]) as tx:
+            if table in self.appenders:
+                self.appenders[table].recover()
+                self.appenders[table].checkpoint()  # log offsets mean nothing after a rewrite
+            offset = tail_offset(path, total - first)
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            tail = _read_typed(io.BytesIO(data), table, header=None, names=columns) if data.strip() else _empty(table)
+            tail.index = range(first, first + len(tail))
+            if len(tail) != total - first or not before.index.isin(tail.index).all() \
+                    or not _same_rows(tail.loc[before.index], before.reindex(columns=columns)):
+                raise ValueError(STALE_EDIT)
+            tail = tail.drop(index=before.index.difference(after.index))
+            if len(after):
+                tail.loc[after.index, columns] = _typed(table, after)
+            tail = pd.concat([tail, _typed(table, inserted)]) if len(inserted) else tail
+            tx.replace_tail(path, offset, tail)
+        record_commit(table, tx.before[os.path.abspath(path)], tx.after[os.path.abspath(path)])
+        LOADER_CACHE.invalidate(path)
+
+    # --- LEDGER QUERIES (served by the per-client index) ---
+    def ledger_index(self):
+        return get_ledger_index(self.path("ledger"))
+
+    def client_names(self):
+        return self.ledger_index().client_names()
+
+    def client_summary(self, client_name):
+        return self.ledger_index().summary(client_name)
+
+    def client_history(self, client_name, start=None, end=None, last=None):
+        # Oldest first. start <= Date < end and "just the last N" are binary searches on the
+        # index's per-client times; only those rows are pulled from the frame
+        rows = self.ledger_index().window(client_name, start, end, last)
+        return self.load("ledger", rows)
+
+    def revenue(self):
+        return self.ledger_index().revenue()
+
+    # --- CHUNKED READS (exports, see exporter.py) ---
+    def iter_chunks(self, table, client=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+        # Straight off disk a chunk at a time, file order, never the whole table (and not via the
+        # loader cache). The open handle pins the file, so an atomic rewrite mid-export can't mix versions.
+        path = self.path(table)
+        if table == "goals" or not os.path.exists(path):
+            yield _window(self.load(table), client, start, end)
+            return
+        with open(path, "rb") as f:
+            for chunk in _read_typed_chunks(f, table, chunk_rows):
+                perf.count(rows=len(chunk))
+                chunk = _window(chunk, client, start, end)
+                if len(chunk):
+                    yield chunk.reset_index(drop=True)
+
+    # --- GOALS ---
+    def update_goal(self, goal_name, amount_change):
+        with self.lock, file_lock(self.path("goals")):
+            df = self._read("goals") if self.exists("goals") else self.load("goals")
+            hit = df.index[df['Name'] == goal_name].tolist()
+            if not hit:
+                raise ValueError(f"No goal named {goal_name!r}")
+            df.at[hit[0], 'Balance'] += amount_change
+            self.replace("goals", df)
+
+    def transfer_goal(self, goal_name, amount_change, budget_row):
+        # Goal balance and its Burn Book line commit together or not at all (see CsvTransaction)
+        goals_path, budget_path = self.path("goals"), self.path("budget")
+        if not self.exists("goals"):
+            self.load("goals")  # writes the defaults
+        with self.lock, CsvTransaction(self.journal_path, [goals_path, budget_path]) as tx:
+            self.appenders["budget"].recover()  # budget's own log goes first
+            goals = tx.read(goals_path)
+            _move_goal_balance(goals, goal_name, amount_change)
+            tx.rewrite(goals_path, goals)
+            tx.append(budget_path, pd.DataFrame([budget_row], columns=PERSONAL_COLUMNS))
+        for table, path in (("goals", goals_path), ("budget", budget_path)):
+            record_commit(table, tx.before[os.path.abspath(path)], tx.after[os.path.abspath(path)])
+        LOADER_CACHE.invalidate(goals_path)
+        LOADER_CACHE.invalidate(budget_path)
+
+
+# ==========================
+# SQLITE BACKEND
+# ==========================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    Date TEXT, Client TEXT, Type TEXT, Amount REAL, Note TEXT,
+    Savings_Balance REAL, Niece_Earnings REAL, Target REAL, Frequency TEXT
+);
+CREATE INDEX IF NOT EXISTS ledger_client_date ON ledger (Client, Date);
+CREATE INDEX IF NOT EXISTS ledger_client ON ledger (Client);
+CREATE TABLE IF NOT EXISTS budget (
+    Date TEXT, Category TEXT, Item TEXT, Amount REAL, Sass_Level TEXT
+);
+CREATE INDEX IF NOT EXISTS budget_category ON budget (Category);
+CREATE TABLE IF NOT EXISTS goals (
+    Goal_ID TEXT, Name TEXT, Target REAL, Balance REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS goals_name ON goals (Name);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class SqliteStore:
+    name = "sqlite"
+
+    def __init__(self, db_path=DB_FILE, csv_root="."):
+        self.db_path = db_path
+        self.csv_root = csv_root
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        with self.connect() as con:
+            con.executescript(SQLITE_SCHEMA)
+            self._upgrade(con)
+        self.migrate_from_csv()
+
+    def _upgrade(self, con):
+        # The tables have been typed since day one (that's v2); v3 rewrites Date text as DATE_FORMAT
+        row = con.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        version = int(row[0]) if row else 2
+        if version < 3:
+            for table in ("ledger", "budget"):
+                rows = con.execute(f"SELECT rowid, Date FROM {table}").fetchall()
+                if rows:
+                    fixed = format_dates(parse_dates([r[1] for r in rows]))
+                    con.executemany(f"UPDATE {table} SET Date = ? WHERE rowid = ?",
+                                    [(None if pd.isna(new) else new, rowid) for (rowid, old), new in zip(rows, fixed) if new != old])
+        con.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+
+    def connect(self):
+        # One connection per thread: Streamlit runs each session on its own thread
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _query(self, sql, params=()):
+        df = pd.read_sql_query(sql, self.connect(), params=params)
+        perf.count(rows=len(df))
+        return df
+
+    def exists(self, table):
+        return self.connect().execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+
+    def version(self, table):
+        # Per-table write counter in meta, bumped inside every write transaction (the db file's
+        # signature would move on a write to any table)
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (f"version:{table}",)).fetchone()
+        return row[0] if row else None
+
+    def _bump(self, con, table):
+        # Inside the write's transaction, after its own statements, so nobody else can commit in between
+        key = f"version:{table}"
+        before = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        con.execute("INSERT INTO meta VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        after = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        record_commit(table, before[0] if before else None, after[0])
+
+    def _cache_key(self, table):
+        return f"{self.db_path}:{table}"
+
+    def _signature(self):
+        # In WAL mode commits land in the -wal file first, so both files make up the version
+        return (file_signature(self.db_path), file_signature(self.db_path + "-wal"))
+
+    def load(self, table):
+        df = LOADER_CACHE.get(self._cache_key(table), self._signature(),
+                              lambda: _typed(table, self._query(f"SELECT * FROM {table} ORDER BY rowid")))
+        if table == "goals" and df.empty:
+            df = pd.DataFrame(DEFAULT_GOALS)
+            self.replace("goals", df)
+        return df
+
+    def append(self, table, row):
+        columns = TABLES[table]["columns"]
+        placeholders = ", ".join("?" for _ in columns)
+        with self.lock, self.connect() as con:
+            con.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                        [row.get(c) for c in columns])
+            self._bump(con, table)
+        LOADER_CACHE.invalidate(self._cache_key(table))
+
+    def post_client_transaction(self, row, savings_change):
+        # BEGIN IMMEDIATE takes the write lock up front, so the balance read and the insert can't interleave.
+        # "Last balance" is the last row posted (rowid), not the latest Date: a backdated import doesn't reset it
+        columns = CLIENT_COLUMNS
+        placeholders = ", ".join("?" for _ in columns)
+        with self.lock:
+            con = self.connect()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                last = con.execute("SELECT Savings_Balance FROM ledger WHERE Client = ? ORDER BY rowid DESC LIMIT 1",
+                                   (row["Client"],)).fetchone()
+                row["Savings_Balance"] = (last[0] if last and last[0] is not None else 0.0) + savings_change
+                con.execute(f"INSERT INTO ledger ({', '.join(columns)}) VALUES ({placeholders})",
+                            [row.get(c) for c in columns])
+                self._bump(con, "ledger")
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        LOADER_CACHE.invalidate(self._cache_key("ledger"))
+        return row
+
+    def post_client_transactions(self, df, savings_changes):
+        columns = CLIENT_COLUMNS
+        placeholders = ", ".join("?" for _ in columns)
+        df = df.reset_index(drop=True).reindex(columns=columns)
+        changes = pd.Series(savings_changes).reset_index(drop=True).astype(float)
+        with self.lock:
+            con = self.connect()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                clients = list(df["Client"].unique())
+                base = {c: 0.0 for c in clients}
+                for client in clients:
+                    last = con.execute("SELECT Savings_Balance FROM ledger WHERE Client = ? ORDER BY rowid DESC LIMIT 1",
+                                       (client,)).fetchone()
+                    if last and last[0] is not None:
+                        base[client] = last[0]
+                df["Savings_Balance"] = df["Client"].map(base) + changes.groupby(df["Client"]).cumsum()
+                rows = df.astype(object).where(df.notna(), None)
+                con.executemany(f"INSERT INTO ledger ({', '.join(columns)}) VALUES ({placeholders})",
+                                rows.itertuples(index=False, name=None))
+                self._bump(con, "ledger")
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        LOADER_CACHE.invalidate(self._cache_key("ledger"))
+        return df
+
+    def replace(self, table, df):
+        columns = TABLES[table]["columns"]
+        placeholders = ", ".join("?" for _ in columns)
+        with self.lock, self.connect() as con:
+            con.execute(f"DELETE FROM {table}")
+            con.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                            _sql_rows(table, df))
+            self._bump(con, table)
+        LOADER_CACHE.invalidate(self._cache_key(table))
+
+    def apply_edits(self, table, before, after, inserted):
+        # Same contract as CsvStore.apply_edits: UPDATE / DELETE / INSERT by rowid in one transaction
+        columns = TABLES[table]["columns"]
+        placeholders = ", ".join("?" for _ in columns)
+        first = int(before.index.min()) if len(before) else None
+        with self.lock:
+            con = self.connect()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                if first is not None:
+                    # positions -> rowids for just the touched span, then the touched rows themselves
+                    last = int(before.index.max())
+                    span = [r[0] for r in con.execute(f"SELECT rowid FROM {table} ORDER BY rowid LIMIT ? OFFSET ?",
+                                                      (last - first + 1, first))]
+                    if len(span) != last - first + 1:
+                        raise ValueError(STALE_EDIT)
+                    rowids = pd.Series(span, index=range(first, last + 1))[before.index]
+                    rows = con.execute(f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid IN ({', '.join('?' * len(rowids))})",
+                                       [int(r) for r in rowids]).fetchall()
+                    current = _typed(table, pd.DataFrame([r[1:] for r in rows], columns=columns, index=[r[0] for r in rows]))
+                    if not _same_rows(current.reindex(rowids.to_numpy()), before.reindex(columns=columns)):
+                        raise ValueError(STALE_EDIT)
+                    deleted = before.index.difference(after.index)
+                    con.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(int(rowids[i]),) for i in deleted])
+                    con.executemany(f"UPDATE {table} SET {', '.join(c + ' = ?' for c in columns)} WHERE rowid = ?",
+                                    [(*row, int(rowids[i])) for i, row in zip(after.index, _sql_rows(table, after))])
+                if len(inserted):
+                    con.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                                    _sql_rows(table, inserted))
+                self._bump(con, table)
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        LOADER_CACHE.invalidate(self._cache_key(table))
+
+    # --- LEDGER QUERIES (ledger_client_date for dates, ledger_client for "last posted") ---
+    def client_names(self):
+        rows = self.connect().execute("SELECT Client FROM ledger GROUP BY Client ORDER BY MIN(rowid)").fetchall()
+        return [r[0] for r in rows]
+
+    def client_summary(self, client_name):
+        con = self.connect()
+        last = con.execute("SELECT Savings_Balance FROM ledger WHERE Client = ? ORDER BY rowid DESC LIMIT 1",
+                           (client_name,)).fetchone()
+        stats = con.execute("SELECT MAX(Target), SUM(Niece_Earnings) FROM ledger WHERE Client = ?",
+                            (client_name,)).fetchone()
+        freq = con.execute("SELECT Frequency FROM ledger WHERE Client = ? AND Frequency != '' ORDER BY rowid DESC LIMIT 1",
+                           (client_name,)).fetchone()
+        return {
+            "balance": last[0] if last and last[0] is not None else 0.0,
+            "target": stats[0] or 0.0,
+            "frequency": freq[0] if freq else "",
+            "earnings": stats[1] or 0.0,
+        }
+
+    def client_history(self, client_name, start=None, end=None, last=None):
+        # ledger_client_date is (Client, Date), so the range is an index seek and last=N walks it backwards
+        where, params = _sql_window(client_name, start, end)
+        sql = "SELECT * FROM ledger" + where
+        if last is None:
+            return _typed("ledger", self._query(sql + " ORDER BY Date, rowid", params))
+        df = self._query(sql + " ORDER BY Date DESC, rowid DESC LIMIT ?", params + [last])
+        return _typed("ledger", df.iloc[::-1].reset_index(drop=True))
+
+    def revenue(self):
+        return self.connect().execute("SELECT COALESCE(SUM(Niece_Earnings), 0) FROM ledger").fetchone()[0]
+
+    # --- CHUNKED READS (exports, see exporter.py) ---
+    def iter_chunks(self, table, client=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+        # One SELECT, fetched chunk_rows at a time. It gets its own connection: a download can be
+        # pulled from a different thread per chunk, and in WAL mode the open statement reads one
+        # snapshot however long the export takes.
+        if table == "goals":
+            yield self.load("goals")
+            return
+        where, params = _sql_window(client, start, end)
+        con = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            cursor = con.execute(f"SELECT * FROM {table}{where} ORDER BY rowid", params)
+            columns = [d[0] for d in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                perf.count(rows=len(rows))
+                yield _typed(table, pd.DataFrame(rows, columns=columns))
+        finally:
+            con.close()
+
+    # --- GOALS ---
+    def update_goal(self, goal_name, amount_change):
+        with self.lock, self.connect() as con:
+            if not con.execute("UPDATE goals SET Balance = Balance + ? WHERE Name = ?", (amount_change, goal_name)).rowcount:
+                raise ValueError(f"No goal named {goal_name!r}")
+            self._bump(con, "goals")
+        LOADER_CACHE.invalidate(self._cache_key("goals"))
+
+    def transfer_goal(self, goal_name, amount_change, budget_row):
+        # One transaction for the goal balance and its Burn Book line
+        columns = PERSONAL_COLUMNS
+        placeholders = ", ".join("?" for _ in columns)
+        with self.lock:
+            con = self.connect()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                goals = pd.DataFrame(con.execute("SELECT Name, Balance FROM goals WHERE Name = ?", (goal_name,)).fetchall(),
+                                     columns=["Name", "Balance"])
+                _move_goal_balance(goals, goal_name, amount_change)
+                con.execute("UPDATE goals SET Balance = ? WHERE Name = ?", (float(goals["Balance"].iloc[0]), goal_name))
+                con.execute(f"INSERT INTO budget ({', '.join(columns)}) VALUES ({placeholders})",
+                            [budget_row.get(c) for c in columns])
+                self._bump(con, "goals")
+                self._bump(con, "budget")
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        LOADER_CACHE.invalidate(self._cache_key("goals"))
+        LOADER_CACHE.invalidate(self._cache_key("budget"))
+
+    # --- ONE-SHOT CSV MIGRATION ---
+    def migrate_from_csv(self):
+        with self.lock:
+            con = self.connect()
+            if con.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+                return False
+            import_csv(self, self.csv_root)
+            with con:
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('csv_migrated', datetime('now'))")
+            return True
+
+
+# --- CSV IMPORT / EXPORT ---
+def read_csv_table(root, table):
+    # One CSV as a typed frame without touching it: crash logs are rolled forward and old layouts
+    # upgraded in memory, so importing from CSV never rewrites the CSVs (opening a CsvStore would)
+    path = os.path.join(root, TABLES[table]["file"])
+    with file_lock(path):
+        data = committed_bytes(path, os.path.join(root, TXN_JOURNAL))
+    if not data.strip():
+        return _empty(table)
+    df = pd.read_csv(io.BytesIO(data), low_memory=False)
+    version = _read_versions(os.path.join(root, SCHEMA_FILE)).get(TABLES[table]["file"], 1)
+    if list(df.columns) != TABLES[table]["columns"]:
+        version = 0
+    if version >= SCHEMA_VERSION:
+        try:
+            return _read_typed(io.BytesIO(data), table)
+        except ValueError:
+            version = SCHEMA_VERSION - 1  # hand-edited since its upgrade
+    return _typed(table, _upgrade_frame(table, df, version))
+
+def import_csv(store, root="."):
+    for table in TABLES:
+        if os.path.exists(os.path.join(root, TABLES[table]["file"])):
+            store.replace(table, read_csv_table(root, table))
+
+def export_csv(store, root="."):
+    target = CsvStore(root)
+    for table in TABLES:
+        target.replace(table, store.load(table))
+
+
+# --- PICK A BACKEND ---
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(backend=None):
+    backend = backend or os.environ.get("BANK_STORAGE", "csv")
+    with _STORES_LOCK:
+        if backend not in _STORES:
+            if backend == "sqlite":
+                _STORES[backend] = SqliteStore(os.environ.get("BANK_DB", DB_FILE))
+            elif backend == "csv":
+                _STORES[backend] = CsvStore()
+            elif backend == "parquet":
+                from parquet_store import ParquetStore  # needs pyarrow
+                _STORES[backend] = ParquetStore()
+            else:
+                raise ValueError(f"Unknown storage backend: {backend}")
+        return _STORES[backend]
+
+
+if __name__ == "__main__":
+    # python storage.py migrate   -> import the CSVs into bank.db
+    # python storage.py export    -> write bank.db back out as CSVs
+    # python storage.py upgrade   -> bring the CSVs up to SCHEMA_VERSION (--force re-runs the last step)
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "upgrade":
+        store = CsvStore()  # opening it runs the migrations
+        upgraded = store.migrate(force=True) if "--force" in sys.argv else store.upgraded
+        print(f"Schema v{SCHEMA_VERSION}: " + (", ".join(f"{t} (was v{v})" for t, v in upgraded.items()) or "everything current"))
+        sys.exit(0)
+    db = SqliteStore(os.environ.get("BANK_DB", DB_FILE))
+    if command == "migrate":
+        if not db.migrate_from_csv():
+            import_csv(db)
+        print(f"Imported CSVs into {db.db_path}")
+    elif command == "export":
+        export_csv(db)
+        print(f"Exported {db.db_path} to CSV")
+    else:
+        sys.exit(f"Unknown command: {command}")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+# --- WRITE STRESS TEST ---
+# Hammers save_client_transaction from N threads at once in a scratch folder, then checks that
+# every row landed and that each client's Savings_Balance chain adds up. Then a backdated bulk
+# import and one more deposit: the balance has to carry on from the last row posted, not the
+# latest Date.
+#   python stress_writes.py --threads 16 --writes 50
+#   python stress_writes.py --backend sqlite
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(threads, writes, clients, backend):
+    os.environ["BANK_STORAGE"] = backend
+    os.chdir(tempfile.mkdtemp(prefix="bank_stress_"))
+    sys.path.insert(0, REPO_DIR)
+    from streamlit import config, logger
+    config.get_config_options()  # parse config first, or it resets the level we set below
+    logger.set_log_level("error")  # quiet the bare-mode warnings
+    import bank_app  # bare mode: the UI part just no-ops
+
+    names = [f"Plastic {i}" for i in range(clients)]
+    for name in names:
+        bank_app.save_client_transaction(name, "Open", 0, "Joined the Clique", 0, 0, target=100.0, freq="Weekly")
+
+    errors = []
+    def writer(n):
+        try:
+            for i in range(writes):
+                bank_app.save_client_transaction(names[(n + i) % clients], "Deposit", 10.0, f"writer {n} #{i}", 8.5, 1.5)
+        except Exception as e:
+            errors.append(e)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - started
+
+    df = bank_app.STORE.load("ledger")
+    expected_rows = clients + threads * writes
+    problems = [f"writer error: {e!r}" for e in errors]
+    if len(df) != expected_rows:
+        problems.append(f"expected {expected_rows} rows, found {len(df)}")
+    deposits = df[df["Type"] == "Deposit"]
+    if deposits["Note"].nunique() != threads * writes:
+        problems.append(f"expected {threads * writes} distinct deposits, found {deposits['Note'].nunique()}")
+    for name in names:
+        balances = df.loc[df["Client"] == name, "Savings_Balance"].astype(float).to_numpy()
+        chain = [round(b - a, 2) for a, b in zip(balances, balances[1:])]
+        if any(step != 8.5 for step in chain):
+            problems.append(f"{name}: broken balance chain")
+
+    problems += check_backdated(bank_app)
+
+    print(f"{backend}: {threads} threads x {writes} writes in {elapsed:.2f}s "
+          f"({threads * writes / elapsed:,.0f} commits/s)")
+    appender = getattr(bank_app.STORE, "appenders", {}).get("ledger")
+    if appender:
+        print(f"group commit: {appender.commits} rows in {appender.batches} batches, {appender.fsyncs} fsyncs")
+    for p in problems:
+        print("FAIL:", p)
+    return not problems
+
+
+def check_backdated(bank_app):
+    from bulk_import import bulk_import
+    name = "Plastic Backdated"
+    bank_app.save_client_transaction(name, "Open", 0, "Joined the Clique", 0, 0, target=500.0, freq="Weekly")
+    bank_app.save_client_transaction(name, "Deposit", 100.0, "today", 85.0, 15.0)
+    bulk_import(pd.DataFrame([{"Client": name, "Type": "Deposit", "Amount": 100.0, "Date": "2020-01-01"}]),
+                store=bank_app.STORE)
+    bank_app.save_client_transaction(name, "Deposit", 100.0, "after the import", 85.0, 15.0)
+    balance = bank_app.STORE.client_summary(name)["balance"]
+    if round(balance, 2) != 255.0:
+        return [f"backdated import: balance {balance:.2f} after three deposits, expected 255.00"]
+    return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent writers vs save_client_transaction")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--backend", choices=["csv", "sqlite", "parquet"], default="csv")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.threads, args.writes, args.clients, args.backend) else 1)
@@ -0,0 +1,117 @@
+import threading
+
+import pandas as pd
+
+from safe_io import recording_commits
+
+# --- MATERIALIZED TOTALS ---
+# Shopping Money is lifetime revenue + the Burn Book's signed net - whatever is parked in goals.
+# Instead of re-summing three tables every rerun, each part is kept as a running number that the
+# save functions (bank_engine's store bindings) bump by their own delta. A table somebody else
+# changed (another process, bulk_import, a manual edit) is spotted by its version and that one
+# part is recomputed; reconcile() recomputes everything and reports drift.
+# Lives in its own module so it survives Streamlit reruns, same as the ledger index.
+
+PARTS = ("ledger", "budget", "goals")
+
+
+def _signed_budget_total(budget_df):
+    from bank_engine import signed_amounts  # bank_engine imports us
+    return float(signed_amounts(budget_df).sum()) if not budget_df.empty else 0.0
+
+
+class Totals:
+    def __init__(self, store):
+        self.store = store
+        self.values = {}       # part -> running total
+        self.versions = {}     # part -> store.version(part) the total is good for
+        self.generations = {}  # part -> bumped on every recompute/drop, so a stale delta can't land twice
+        self.recomputes = 0
+        self.lock = threading.RLock()
+
+    # --- FULL RECOMPUTE ---
+    def compute(self, part):
+        if part == "ledger":
+            return float(self.store.revenue() or 0.0)
+        if part == "budget":
+            return _signed_budget_total(self.store.load("budget"))
+        goals = self.store.load("goals")
+        return float(pd.to_numeric(goals["Balance"], errors="coerce").fillna(0.0).sum())
+
+    def _recompute(self, part):
+        version = self.store.version(part)
+        self.values[part] = self.compute(part)
+        self.versions[part] = version
+        self.generations[part] = self.generations.get(part, 0) + 1
+        self.recomputes += 1
+
+    # --- READS (O(1) unless the table moved under us) ---
+    def get(self, part):
+        with self.lock:
+            if part not in self.values or self.versions[part] != self.store.version(part):
+                self._recompute(part)
+            return self.values[part]
+
+    def revenue(self):
+        return self.get("ledger")
+
+    def budget_net(self):
+        return self.get("budget")
+
+    def goals_total(self):
+        return self.get("goals")
+
+    def available_cash(self):
+        return self.revenue() + self.budget_net() - self.goals_total()
+
+    # --- WRITES ---
+    def apply(self, deltas, write):
+        # Runs write() and adds each {part: delta}. The store reports the version just before and
+        # just after each commit, read under the write's own lock (safe_io.record_commit). The delta
+        # only lands if the running total was good for that "before": if another process or session
+        # committed in between, its rows are in the new version but not in our number, so the part
+        # is dropped instead and the next read recomputes it. If write() raises, nothing here has changed.
+        with self.lock:
+            cached = {part: (self.generations.get(part), self.versions[part]) for part in deltas if part in self.values}
+        with recording_commits() as commits:
+            result = write()
+        with self.lock:
+            for part, delta in deltas.items():
+                spans = [(before, after) for table, before, after in commits if table == part]
+                ours = (part in cached and delta is not None and spans
+                        and self.generations.get(part) == cached[part][0] and spans[0][0] == cached[part][1]
+                        and all(after == before for (_, after), (before, _) in zip(spans, spans[1:])))
+                if ours:
+                    self.values[part] += delta
+                    self.versions[part] = spans[-1][1]
+                else:
+                    self.drop(part)
+        return result
+
+    def drop(self, part):
+        with self.lock:
+            self.values.pop(part, None)
+            self.generations[part] = self.generations.get(part, 0) + 1
+
+    # --- RECONCILE ---
+    def reconcile(self):
+        # Full recompute of every part; returns {part: (running, recomputed, drift)}
+        report = {}
+        with self.lock:
+            for part in PARTS:
+                running = self.values.get(part)
+                self._recompute(part)
+                fresh = self.values[part]
+                report[part] = (running, fresh, None if running is None else round(running - fresh, 6))
+        return report
+
+
+_TOTALS = {}
+_TOTALS_LOCK = threading.Lock()
+
+
+def get_totals(store):
+    with _TOTALS_LOCK:
+        if id(store) not in _TOTALS:
+            _TOTALS[id(store)] = Totals(store)
+        return _TOTALS[id(store)]
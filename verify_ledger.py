@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bank_engine import savings_changes
+from safe_io import CsvAppender, atomic_write_csv, file_lock, read_header
+from storage import CLIENT_COLUMNS, CLIENT_FILE, LOADER_CACHE, get_store
+
+# --- LEDGER VERIFY / REBUILD ---
+# Every ledger row carries a Savings_Balance worked out from the row before it, so one hand edit or
+# lost write leaves every later balance wrong. This replays each client's chain from Type/Amount and
+# reports the first row where the stored balance stops matching.
+#   python verify_ledger.py                 -> full check
+#   python verify_ledger.py --incremental   -> only rows added since the last clean check
+#   python verify_ledger.py --repair        -> full check, then rewrite the balances that are off
+# Checks whichever backend BANK_STORAGE picks. sqlite / parquet have no byte offsets to remember,
+# so they always get a full pass through the store (--incremental and --file are csv only).
+
+CHECKPOINT_FILE = ".ledger_verify.json"
+TOLERANCE = 0.005
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def expected_changes(df):
+    # Deposits move savings by the amount minus the cut actually taken on that row (falling back to
+    # the 15% rule when the row has no Niece_Earnings); loans take the amount out; the rest is 0
+    changes = savings_changes(df["Type"], df["Amount"])
+    earnings = pd.to_numeric(df["Niece_Earnings"], errors="coerce").to_numpy()
+    amounts = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0).to_numpy()
+    taken = (df["Type"].to_numpy() == "Deposit") & ~np.isnan(earnings)
+    return np.where(taken, amounts - np.nan_to_num(earnings), changes)
+
+
+def rebuild_balances(df, opening=None):
+    # opening: {client: balance before the first row in df} for incremental checks
+    changes = pd.Series(expected_changes(df), index=df.index)
+    expected = changes.groupby(df["Client"]).cumsum()
+    if opening:
+        expected += df["Client"].map(opening).fillna(0.0)
+    return expected.round(2)
+
+
+def find_divergences(df, expected, first_row=0):
+    stored = pd.to_numeric(df["Savings_Balance"], errors="coerce")
+    bad = ~np.isclose(stored.fillna(np.inf), expected, atol=TOLERANCE)
+    if not bad.any():
+        return pd.DataFrame(columns=["Client", "Row", "Date", "Stored", "Expected", "Rows_Off"])
+    flagged = df.loc[bad, ["Client", "Date"]].assign(
+        Row=np.flatnonzero(bad) + first_row, Stored=stored[bad], Expected=expected[bad])
+    first = flagged.groupby("Client", sort=False).head(1).copy()
+    first["Rows_Off"] = flagged.groupby("Client", sort=False).size().reindex(first["Client"]).to_numpy()
+    return first[["Client", "Row", "Date", "Stored", "Expected", "Rows_Off"]].reset_index(drop=True)
+
+
+# --- CHECKPOINTS ---
+# After a clean pass we remember where the file ended, every client's balance there, and a hash of
+# the bytes just before that point. Next time only the tail gets parsed, unless the hash shows the
+# verified part was edited, in which case we fall back to a full pass.
+def _fingerprint(file_path, offset):
+    with open(file_path, "rb") as f:
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        return hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+def load_checkpoint(file_path, checkpoint_file=CHECKPOINT_FILE):
+    try:
+        with open(checkpoint_file, encoding="utf-8") as f:
+            cp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cp.get("file") != os.path.abspath(file_path) or os.path.getsize(file_path) < cp["offset"]:
+        return None
+    if read_header(file_path) != CLIENT_COLUMNS:
+        return None
+    if _fingerprint(file_path, cp["offset"]) != cp["fingerprint"]:
+        return None
+    return cp
+
+def save_checkpoint(file_path, offset, rows, balances, checkpoint_file=CHECKPOINT_FILE):
+    cp = {"file": os.path.abspath(file_path), "offset": offset, "rows": rows, "balances": balances,
+          "fingerprint": _fingerprint(file_path, offset), "verified_at": datetime.now().strftime("%Y-%m-%d %H:%M")}
+    tmp_path = checkpoint_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cp, f)
+    os.replace(tmp_path, checkpoint_file)
+
+
+# --- ENTRY POINTS ---
+def verify(file_path=CLIENT_FILE, incremental=False, repair=False, checkpoint_file=CHECKPOINT_FILE):
+    # Returns (divergences, rows_checked). Only writes the checkpoint when the ledger is clean.
+    if not os.path.exists(file_path):
+        return find_divergences(pd.DataFrame(columns=CLIENT_COLUMNS), pd.Series(dtype=float)), 0
+    with file_lock(file_path):
+        # Finish anything a crashed writer left in the write-ahead log before reading
+        appender = CsvAppender(file_path, CLIENT_COLUMNS)
+        appender.recover()
+        cp = load_checkpoint(file_path, checkpoint_file) if incremental and not repair else None
+        if cp:
+            with open(file_path, "rb") as f:
+                f.seek(cp["offset"])
+                tail = f.read()
+            offset = cp["offset"] + len(tail)
+            df = pd.read_csv(io.BytesIO(tail), header=None, names=CLIENT_COLUMNS) if tail.strip() else pd.DataFrame(columns=CLIENT_COLUMNS)
+            first_row, opening = cp["rows"], cp["balances"]
+        else:
+            offset = os.path.getsize(file_path)
+            df = pd.read_csv(file_path).reindex(columns=CLIENT_COLUMNS)
+            first_row, opening = 0, {}
+
+        expected = rebuild_balances(df, opening)
+        divergences = find_divergences(df, expected, first_row)
+
+        if repair and not divergences.empty:
+            df["Savings_Balance"] = expected
+            appender.checkpoint()  # the log's byte offsets are meaningless after a rewrite
+            atomic_write_csv(df, file_path)
+            LOADER_CACHE.invalidate(file_path)
+            offset = os.path.getsize(file_path)
+
+        if divergences.empty or repair:
+            balances = dict(opening)
+            if not df.empty:
+                balances.update(expected.groupby(df["Client"]).last().to_dict())
+            save_checkpoint(file_path, offset, first_row + len(df), balances, checkpoint_file)
+    return divergences, len(df)
+
+def verify_store(store, repair=False):
+    # Same check through the store API, in commit order. A repair rewrites the whole ledger, and
+    # refuses if anything was posted while we were checking.
+    version = store.version("ledger")
+    df = store.load("ledger").copy()
+    expected = rebuild_balances(df)
+    divergences = find_divergences(df, expected)
+    if repair and not divergences.empty:
+        with store.lock:
+            if store.version("ledger") != version:
+                raise ValueError("The ledger changed while it was being checked; run it again")
+            df["Savings_Balance"] = expected
+            store.replace("ledger", df)
+    return divergences, len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute Savings_Balance from history and report where it breaks")
+    parser.add_argument("--file", default=CLIENT_FILE, help="csv backend only")
+    parser.add_argument("--incremental", action="store_true", help="only check rows added since the last clean check")
+    parser.add_argument("--repair", action="store_true", help="rewrite wrong balances in place")
+    args = parser.parse_args()
+    backend = os.environ.get("BANK_STORAGE", "csv")
+    try:
+        if backend == "csv":
+            divergences, checked = verify(args.file, incremental=args.incremental, repair=args.repair)
+        else:
+            divergences, checked = verify_store(get_store(backend), repair=args.repair)
+    except ValueError as e:
+        sys.exit(f"Verify failed: {e}")
+    if divergences.empty:
+        print(f"Ledger is clean ({checked:,} rows checked). So fetch.")
+        sys.exit(0)
+    print(f"{len(divergences)} client(s) with broken balances ({checked:,} rows checked):")
+    print(divergences.to_string(index=False))
+    if args.repair:
+        print("Repaired in place.")
+    sys.exit(0 if args.repair else 1)